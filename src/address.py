@@ -0,0 +1,88 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# 都道府県リストの作成（日本の都道府県名）
+prefectures = [
+    '北海道', '青森県', '岩手県', '宮城県', '秋田県', '山形県', '福島県',
+    '茨城県', '栃木県', '群馬県', '埼玉県', '千葉県', '東京都', '神奈川県',
+    '新潟県', '富山県', '石川県', '福井県', '山梨県', '長野県',
+    '岐阜県', '静岡県', '愛知県', '三重県',
+    '滋賀県', '京都府', '大阪府', '兵庫県', '奈良県', '和歌山県',
+    '鳥取県', '島根県', '岡山県', '広島県', '山口県',
+    '徳島県', '香川県', '愛媛県', '高知県',
+    '福岡県', '佐賀県', '長崎県', '熊本県', '大分県', '宮崎県', '鹿児島県', '沖縄県'
+]
+
+# 都道府県から地域へのマッピング
+prefecture_to_region = {
+    '北海道': '北海道地方',
+    '青森県': '東北地方', '岩手県': '東北地方', '宮城県': '東北地方', '秋田県': '東北地方', '山形県': '東北地方', '福島県': '東北地方',
+    '茨城県': '関東地方', '栃木県': '関東地方', '群馬県': '関東地方', '埼玉県': '関東地方', '千葉県': '関東地方', '東京都': '関東地方', '神奈川県': '関東地方',
+    '新潟県': '中部地方', '富山県': '中部地方', '石川県': '中部地方', '福井県': '中部地方', '山梨県': '中部地方', '長野県': '中部地方',
+    '岐阜県': '中部地方', '静岡県': '中部地方', '愛知県': '中部地方',
+    '三重県': '近畿地方', '滋賀県': '近畿地方', '京都府': '近畿地方', '大阪府': '近畿地方', '兵庫県': '近畿地方', '奈良県': '近畿地方', '和歌山県': '近畿地方',
+    '鳥取県': '中国地方', '島根県': '中国地方', '岡山県': '中国地方', '広島県': '中国地方', '山口県': '中国地方',
+    '徳島県': '四国地方', '香川県': '四国地方', '愛媛県': '四国地方', '高知県': '四国地方',
+    '福岡県': '九州・沖縄地方', '佐賀県': '九州・沖縄地方', '長崎県': '九州・沖縄地方', '熊本県': '九州・沖縄地方', '大分県': '九州・沖縄地方',
+    '宮崎県': '九州・沖縄地方', '鹿児島県': '九州・沖縄地方', '沖縄県': '九州・沖縄地方'
+}
+
+OTHER = 'その他'
+PREFECTURE_CATEGORIES = prefectures + [OTHER]
+REGION_CATEGORIES = list(dict.fromkeys(prefecture_to_region.values())) + [OTHER]
+
+# 47都道府県を1つの正規表現にまとめる（住所中で最初に現れる都道府県名に一致）
+_prefecture_pattern = re.compile('(' + '|'.join(map(re.escape, prefectures)) + ')')
+
+# 住所→都道府県の解析結果（同じ住所は二度解析しない）
+_prefecture_cache = {}
+
+
+# 住所の列から都道府県を抽出する関数（カテゴリ型で返す）
+# 住所を一意な値にまとめてから正規表現で一括抽出する
+def extract_prefectures(addresses):
+    addresses = pd.Series(addresses)
+    codes, uniques = pd.factorize(addresses)
+    uniques = pd.Series(uniques, dtype=object)
+
+    new = uniques[~uniques.isin(_prefecture_cache.keys())]
+    if len(new):
+        found = new.astype(str).str.extract(_prefecture_pattern, expand=False)
+        _prefecture_cache.update(zip(new, found.fillna(OTHER)))
+
+    unique_prefectures = np.array([_prefecture_cache[address] for address in uniques] + [OTHER], dtype=object)
+    # factorize で欠損値は -1 になるので末尾の「その他」を参照させる
+    values = unique_prefectures[codes]
+    return pd.Series(
+        pd.Categorical(values, categories=PREFECTURE_CATEGORIES),
+        index=addresses.index,
+    )
+
+
+# 都道府県の列から地域を求める関数（カテゴリ型で返す）
+def prefectures_to_regions(prefecture_values):
+    prefecture_values = pd.Series(prefecture_values)
+    regions = prefecture_values.astype(object).map(prefecture_to_region).fillna(OTHER)
+    return pd.Series(
+        pd.Categorical(regions, categories=REGION_CATEGORIES),
+        index=prefecture_values.index,
+    )
+
+
+# 企業一覧に都道府県と地域の列を一度だけ追加する関数
+def add_location_columns(company_info, address_col='住所'):
+    if '都道府県' not in company_info.columns:
+        company_info['都道府県'] = extract_prefectures(company_info[address_col])
+    if '地域' not in company_info.columns:
+        company_info['地域'] = prefectures_to_regions(company_info['都道府県'])
+    return company_info
+
+
+# 指定した企業群の地域別の企業数を返す関数
+def region_counts(company_info, company_ids=None, id_col='企業ID'):
+    add_location_columns(company_info)
+    rows = company_info if company_ids is None else company_info[company_info[id_col].isin(company_ids)]
+    counts = rows['地域'].value_counts()
+    return counts[counts > 0].to_dict()
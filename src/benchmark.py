@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from community.community_louvain import best_partition
+
+from centrality import CentralityService
+from cluster_aggregation import aggregate_cluster_stats, cluster_company_bridge
+from coinvestment import build_coinvestment_graph
+from jaccard import jaccard_edges
+from layout import hierarchical_layout
+from network_render import render_network
+from pipeline import kcore_graph
+from synthetic import generate, load_tables, write_tables
+
+STAGES = ("load", "edge_build", "jaccard", "kcore", "louvain", "centrality", "aggregation", "layout", "render")
+
+
+# 1つの段階の実行時間とメモリ使用量のピークを測る関数
+# trace_memory=True の場合は tracemalloc でPython/NumPyの確保量のピークを測る（計測中は遅くなる）
+def measure(stage, func, trace_memory=True):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    row = {"stage": stage, "seconds": seconds}
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        row["peak_mb"] = peak / 2 ** 20
+    return result, row
+
+
+# 合成データに対して各段階を順に実行し、段階ごとの計測結果を返す関数
+def run_benchmark(data_dir, threshold=0.3, k=3, trace_memory=True, stages=STAGES):
+    rows = []
+
+    def step(stage, func):
+        if stage not in stages:
+            return None
+        result, row = measure(stage, func, trace_memory)
+        rows.append(row)
+        print(f"  {stage}: {row['seconds']:.2f}s" + (f", {row['peak_mb']:.1f} MB" if "peak_mb" in row else ""))
+        return result
+
+    # 後の段階は前の段階の結果を使うので、計測対象外の段階も結果だけは作る
+    def run(stage, func):
+        result = step(stage, func)
+        return func() if result is None else result
+
+    tables = run("load", lambda: load_tables(data_dir))
+    investments = tables["資金調達情報_出資元"]
+    G = run("edge_build", lambda: build_coinvestment_graph(investments))
+    jaccard = run("jaccard", lambda: jaccard_edges(G, threshold))
+    core = run("kcore", lambda: kcore_graph(G, jaccard, k))
+    partition = run("louvain", lambda: best_partition(core, weight="weight", random_state=0))
+
+    def centralities():
+        service = CentralityService(core, partition, approx=True, epsilon=0.05)
+        return {measure_name: service.get(measure_name) for measure_name in ("degree", "betweenness", "closeness")}
+
+    step("centrality", centralities)
+
+    def aggregation():
+        clustered_nodes = pd.DataFrame({"企業名": list(partition), "クラスタID": list(partition.values())})
+        bridge = cluster_company_bridge(investments, clustered_nodes)
+        return aggregate_cluster_stats(
+            bridge, tables["企業一覧"],
+            numeric=["従業員数", "合計資金調達額（百万円）", "評価額"], categorical=["上場区分"],
+        )
+
+    step("aggregation", aggregation)
+    pos = run("layout", lambda: hierarchical_layout(core, partition, seed=42))
+
+    def render():
+        with tempfile.TemporaryDirectory() as tmp:
+            return render_network(core, pos, partition, os.path.join(tmp, "network.png"))
+
+    step("render", render)
+    return pd.DataFrame(rows)
+
+
+# 前回の計測結果と比べて、tolerance 以上遅くなった・メモリが増えた段階に印を付ける関数
+def compare(results, baseline, tolerance=0.2):
+    merged = results.merge(baseline, on=["scale", "stage"], how="left", suffixes=("", "_baseline"))
+    merged["time_ratio"] = merged["seconds"] / merged["seconds_baseline"]
+    merged["regression"] = merged["time_ratio"] > 1 + tolerance
+    if "peak_mb" in merged and "peak_mb_baseline" in merged:
+        merged["memory_ratio"] = merged["peak_mb"] / merged["peak_mb_baseline"]
+        merged["regression"] |= merged["memory_ratio"] > 1 + tolerance
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成データで各段階の実行時間とメモリ使用量を計測する")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="data/synthetic")
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc によるメモリ計測を行わない")
+    parser.add_argument("--baseline", help="比較する前回の計測結果（JSON）")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        data_dir = os.path.join(args.data_dir, f"x{scale:g}")
+        if not os.path.exists(data_dir):
+            write_tables(generate(scale, args.seed), data_dir)
+        print(f"x{scale:g}:")
+        result = run_benchmark(data_dir, args.threshold, args.k, not args.no_memory, args.stages)
+        results.append(result.assign(scale=scale))
+    results = pd.concat(results, ignore_index=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = pd.DataFrame(json.load(f))
+        compared = compare(results, baseline, args.tolerance)
+        print(compared.to_string(index=False))
+        if compared["regression"].any():
+            print("Regressions:")
+            print(compared.loc[compared["regression"], ["scale", "stage", "seconds", "seconds_baseline"]].to_string(index=False))
+    else:
+        print(results.to_string(index=False))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results.to_dict(orient="records"), f, ensure_ascii=False, indent=2, default=float)
+    print(f"Benchmark results saved as {args.output}")
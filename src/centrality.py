@@ -0,0 +1,150 @@
+import math
+import random
+
+import networkx as nx
+import pandas as pd
+
+from instrumentation import instrumented, stage
+from parallel import process_pool
+
+MEASURES = ("degree", "betweenness", "closeness", "eigenvector")
+
+
+# ピボット数の上限（ノード数に対する割合）と下限
+# Hoeffdingの不等式によるピボット数 ln(2n/δ)/(2ε²) は epsilon=0.05 では約 200·ln(20n) になり、
+# 数千ノード以下のグラフではノード数を超えるので、上限がないと近似の経路でも常に厳密計算になる
+MAX_PIVOT_FRACTION = 0.2
+MIN_PIVOTS = 100
+
+
+# 近似中心性で使うピボット数
+# 誤差 epsilon を確率 1 - delta で保証するピボット数（Hoeffdingの不等式）と、
+# ノード数の MAX_PIVOT_FRACTION 倍（MIN_PIVOTS 以上）の小さい方。上限にかかった場合は epsilon の保証はない
+# 戻り値がノード数以上（MIN_PIVOTS 以下の小さなグラフ）の場合、近似中心性の関数は厳密な値を計算する
+def pivot_count(n, epsilon, delta, max_fraction=MAX_PIVOT_FRACTION, min_pivots=MIN_PIVOTS):
+    if n <= 1:
+        return n
+    bound = math.ceil(math.log(2 * n / delta) / (2 * epsilon ** 2))
+    cap = max(min_pivots, math.ceil(max_fraction * n))
+    return min(n, bound, cap)
+
+
+# ピボットをサンプリングした近似媒介中心性（Brandes & Pich）
+def approximate_betweenness(G, epsilon=0.05, delta=0.1, seed=42):
+    k = pivot_count(G.number_of_nodes(), epsilon, delta)
+    if k >= G.number_of_nodes():
+        return nx.betweenness_centrality(G)
+    return nx.betweenness_centrality(G, k=k, seed=seed)
+
+
+# サンプリングした始点からの距離で求める近似近接中心性（Eppstein & Wang）
+# networkx の closeness_centrality と同じく非連結グラフでは到達割合で補正する
+def approximate_closeness(G, epsilon=0.05, delta=0.1, seed=42):
+    n = G.number_of_nodes()
+    k = pivot_count(n, epsilon, delta)
+    if k >= n:
+        return nx.closeness_centrality(G)
+
+    sources = random.Random(seed).sample(list(G.nodes()), k)
+    distance_sum = dict.fromkeys(G, 0)
+    reached = dict.fromkeys(G, 0)
+    for source in sources:
+        for node, distance in nx.single_source_shortest_path_length(G, source).items():
+            if node != source:
+                distance_sum[node] += distance
+                reached[node] += 1
+
+    sampled = set(sources)
+    closeness = {}
+    for node in G:
+        if distance_sum[node] == 0:
+            closeness[node] = 0.0
+            continue
+        reach_fraction = reached[node] / (k - (node in sampled))
+        closeness[node] = reach_fraction * reached[node] / distance_sum[node]
+    return closeness
+
+
+# 1つのグラフについて指定された中心性を計算する関数
+def compute_centrality(G, measure, approx=False, epsilon=0.05, delta=0.1, seed=42):
+    if measure == "degree":
+        return nx.degree_centrality(G)
+    if measure == "betweenness":
+        if approx:
+            return approximate_betweenness(G, epsilon, delta, seed)
+        return nx.betweenness_centrality(G)
+    if measure == "closeness":
+        if approx:
+            return approximate_closeness(G, epsilon, delta, seed)
+        return nx.closeness_centrality(G)
+    if measure == "eigenvector":
+        return nx.eigenvector_centrality(G, max_iter=500)
+    raise ValueError(f"Unknown centrality measure: {measure}")
+
+
+# クラスタ1つ分の統計情報（ワーカープロセスで実行）
+def _cluster_stats(args):
+    cluster, subgraph, measures, approx, epsilon, delta, seed = args
+    num_nodes = subgraph.number_of_nodes()
+    stats = {
+        "Cluster": cluster,
+        "Nodes": num_nodes,
+        "Edges": subgraph.number_of_edges(),
+    }
+    for measure in measures:
+        values = compute_centrality(subgraph, measure, approx, epsilon, delta, seed)
+        stats[f"Average {measure.capitalize()} Centrality"] = sum(values.values()) / num_nodes
+    return stats
+
+
+# 中心性を必要になった時点で計算し、結果を保持するクラス
+# approx=True の場合、媒介中心性と近接中心性はサンプリングによる近似値を使う
+class CentralityService:
+    def __init__(self, G, partition=None, approx=False, epsilon=0.05, delta=0.1, seed=42, max_workers=None):
+        self.G = G
+        self.partition = partition
+        self.approx = approx
+        self.epsilon = epsilon
+        self.delta = delta
+        self.seed = seed
+        self.max_workers = max_workers
+        self._cache = {}
+
+    # グラフ全体の中心性（初回のみ計算）
+    def get(self, measure):
+        if measure not in self._cache:
+            with stage(f"centrality:{measure}", approx=self.approx) as current:
+                self._cache[measure] = current.describe(compute_centrality(
+                    self.G, measure, self.approx, self.epsilon, self.delta, self.seed
+                ))
+        return self._cache[measure]
+
+    def degree(self):
+        return self.get("degree")
+
+    def betweenness(self):
+        return self.get("betweenness")
+
+    def closeness(self):
+        return self.get("closeness")
+
+    def eigenvector(self):
+        return self.get("eigenvector")
+
+    # クラスタごとの部分グラフの中心性平均を、クラスタ単位でワーカープロセスに分散して計算する
+    @instrumented("cluster_centrality")
+    def cluster_summary(self, measures=MEASURES):
+        if self.partition is None:
+            raise ValueError("partition is required for cluster_summary")
+        members = {}
+        for node, cluster in self.partition.items():
+            members.setdefault(cluster, []).append(node)
+        # 大きいクラスタから投入して待ち時間を減らす
+        tasks = [
+            (cluster, self.G.subgraph(nodes).copy(), tuple(measures),
+             self.approx, self.epsilon, self.delta, self.seed)
+            for cluster, nodes in sorted(members.items(), key=lambda item: -len(item[1]))
+        ]
+        with process_pool(max_workers=self.max_workers) as executor:
+            rows = list(executor.map(_cluster_stats, tasks))
+        return pd.DataFrame(rows).sort_values("Cluster").reset_index(drop=True)
@@ -0,0 +1,93 @@
+import pandas as pd
+
+from entity_index import ENTITY_ID_COL, EntityIndex
+from graph_store import INVESTOR_ID_COL
+from instrumentation import instrumented
+
+CLUSTER_COL = "新クラスタID"
+COMPANY_ID_COL = "企業ID"
+NUMERIC_AGGS = ["mean", "median", "min", "max", "sum"]
+
+# 集計結果（縦持ち）の列名
+METRIC_COL = "指標"
+KEY_COL = "区分"
+VALUE_COL = "値"
+
+
+# クラスタ→出資先企業の対応表（重複なし）を作成する関数
+# 出資元をクラスタリング結果と結合し、クラスタIDを0から振り直す
+# 企業名の文字列ではなく整数のIDで結合する。投資情報の行は各行の 出資元・企業ID を使い、
+# IDのない行とクラスタリング結果の企業名だけ、対応表（index）で正規化した名前からIDを求める
+@instrumented("cluster_bridge")
+def cluster_company_bridge(investment_info, clustered_nodes, cluster_col=CLUSTER_COL, index=None):
+    if index is None:
+        index = EntityIndex.from_investments(investment_info)
+    investor_ids = pd.to_numeric(investment_info[INVESTOR_ID_COL], errors="coerce").astype("Int64")
+    missing = investor_ids.isna()
+    if missing.any():
+        investor_ids[missing] = index.ids(investment_info.loc[missing, "出資元・企業名"])
+    investors = pd.DataFrame({
+        ENTITY_ID_COL: investor_ids.to_numpy(),  # 投資元企業
+        COMPANY_ID_COL: investment_info[COMPANY_ID_COL].to_numpy(),
+    }).dropna(subset=[ENTITY_ID_COL])
+    nodes = pd.DataFrame({
+        ENTITY_ID_COL: index.ids(clustered_nodes["企業名"]).to_numpy(),  # クラスタリング結果の企業
+        "クラスタID": clustered_nodes["クラスタID"].to_numpy(),
+    }).dropna(subset=[ENTITY_ID_COL]).drop_duplicates()
+    merged = investors.merge(nodes, on=ENTITY_ID_COL, how="inner")
+    unique_clusters = sorted(merged["クラスタID"].unique())
+    cluster_id_map = {old_id: new_id for new_id, old_id in enumerate(unique_clusters)}
+    merged[cluster_col] = merged["クラスタID"].map(cluster_id_map)
+    return (
+        merged[[cluster_col, COMPANY_ID_COL]]
+        .drop_duplicates()
+        .sort_values([cluster_col, COMPANY_ID_COL])
+        .reset_index(drop=True)
+    )
+
+
+# 対応表と企業単位のテーブルを結合する関数（クラスタごとに対象企業の行が並ぶ）
+def cluster_rows(bridge, table, columns, key=COMPANY_ID_COL):
+    return bridge.merge(table[[key, *columns]], on=key, how="inner")
+
+
+# クラスタごとの統計量を1回のgroupbyでまとめて計算する関数
+# numeric の列は平均・中央値・最小・最大・合計、categorical の列は値ごとの件数を求める
+# 戻り値は (クラスタID, 指標, 区分, 値) の縦持ちのテーブル
+@instrumented("cluster_aggregation")
+def aggregate_cluster_stats(bridge, table, numeric=(), categorical=(), cluster_col=CLUSTER_COL, key=COMPANY_ID_COL):
+    numeric, categorical = list(numeric), list(categorical)
+    merged = cluster_rows(bridge, table, numeric + categorical, key)
+    parts = []
+
+    if numeric:
+        numeric_stats = merged.groupby(cluster_col, observed=True)[numeric].agg(NUMERIC_AGGS)
+        numeric_stats.columns.names = [METRIC_COL, KEY_COL]
+        parts.append(numeric_stats.stack([METRIC_COL, KEY_COL], future_stack=True).rename(VALUE_COL).reset_index())
+
+    for column in categorical:
+        counts = merged.groupby([cluster_col, column], observed=True).size().rename(VALUE_COL).reset_index()
+        counts = counts.rename(columns={column: KEY_COL})
+        counts.insert(1, METRIC_COL, column)
+        parts.append(counts)
+
+    if not parts:
+        return pd.DataFrame(columns=[cluster_col, METRIC_COL, KEY_COL, VALUE_COL])
+    return pd.concat(parts, ignore_index=True)
+
+
+# 指定した指標をクラスタ×区分の表に変換する関数（グラフ描画用）
+def metric_table(stats, metric, cluster_col=CLUSTER_COL):
+    selected = stats[stats[METRIC_COL] == metric]
+    table = selected.pivot(index=cluster_col, columns=KEY_COL, values=VALUE_COL)
+    table.columns.name = None
+    return table
+
+
+# 指定した件数の指標をクラスタごとの辞書（件数の多い順）で返す関数
+def category_counts(stats, metric, cluster_col=CLUSTER_COL):
+    selected = stats[stats[METRIC_COL] == metric].sort_values([cluster_col, VALUE_COL], ascending=[True, False])
+    return {
+        cluster_id: dict(zip(group[KEY_COL], group[VALUE_COL].astype(int)))
+        for cluster_id, group in selected.groupby(cluster_col)
+    }
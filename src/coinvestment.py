@@ -0,0 +1,87 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+ROUND_COL = "資金調達ID"
+INVESTOR_COL = "出資元・企業名"
+
+
+# 資金調達ラウンド×出資元の疎な接続行列Bを作成する関数
+# 同じラウンドに同じ出資元が複数行あっても1として数える
+def build_incidence(df, round_col=ROUND_COL, investor_col=INVESTOR_COL):
+    df = df.dropna(subset=[round_col, investor_col])
+    round_codes, rounds = pd.factorize(df[round_col])
+    investor_codes, investors = pd.factorize(df[investor_col])
+    B = sp.csr_matrix(
+        (np.ones(len(df), dtype=np.int32), (round_codes, investor_codes)),
+        shape=(len(rounds), len(investors)),
+    )
+    B.data[:] = 1
+    return B, rounds, investors
+
+
+# Bᵀ·B から共同出資回数の隣接行列（上三角のみ）を作成する関数
+def coinvestment_matrix(B):
+    C = (B.T @ B).tocsr()
+    return sp.triu(C, k=1).tocoo()
+
+
+# 共同出資エッジを (source, target, weight) のDataFrameで返す関数
+# weight は2社が同じラウンドに出資した回数
+def coinvestment_edges(df, round_col=ROUND_COL, investor_col=INVESTOR_COL):
+    B, _, investors = build_incidence(df, round_col, investor_col)
+    C = coinvestment_matrix(B)
+    return pd.DataFrame({
+        "source": investors[C.row],
+        "target": investors[C.col],
+        "weight": C.data,
+    })
+
+
+# 共同出資ネットワークを作成する関数
+def build_coinvestment_graph(df, round_col=ROUND_COL, investor_col=INVESTOR_COL):
+    edges = coinvestment_edges(df, round_col, investor_col)
+    G = nx.Graph()
+    G.add_weighted_edges_from(edges.itertuples(index=False, name=None))
+    return G
+
+
+# 2つのスナップショットの差分から共同出資回数の増減を求める関数
+# 資金調達IDごとに出資元の組が変わったラウンドだけを取り出し、
+# 変更後のエッジ重みから変更前のエッジ重みを引く（重みが変わらないペアは含まない）
+def coinvestment_delta(previous_df, df, round_col=ROUND_COL, investor_col=INVESTOR_COL):
+    cols = [round_col, investor_col]
+    previous = previous_df[cols].dropna().drop_duplicates()
+    current = df[cols].dropna().drop_duplicates()
+    merged = previous.merge(current, on=cols, how="outer", indicator=True)
+    changed = merged.loc[merged["_merge"] != "both", round_col].unique()
+
+    before = coinvestment_edges(previous[previous[round_col].isin(changed)], round_col, investor_col)
+    after = coinvestment_edges(current[current[round_col].isin(changed)], round_col, investor_col)
+    edges = pd.concat([before.assign(weight=-before["weight"]), after], ignore_index=True)
+
+    # (source, target) の向きを揃えてから合計する
+    swap = (edges["source"] > edges["target"]).to_numpy()
+    edges.loc[swap, ["source", "target"]] = edges.loc[swap, ["target", "source"]].to_numpy()
+    delta = edges.groupby(["source", "target"], as_index=False)["weight"].sum()
+    return delta[delta["weight"] != 0].reset_index(drop=True)
+
+
+# 共同出資グラフに差分を反映する関数（グラフをその場で更新する）
+# 戻り値はエッジが追加・削除された出資元（隣接ノードの集合が変わった出資元）
+def apply_coinvestment_delta(G, delta):
+    affected = set()
+    for source, target, weight in delta.itertuples(index=False, name=None):
+        if G.has_edge(source, target):
+            weight += G[source][target]["weight"]
+            if weight > 0:
+                G[source][target]["weight"] = weight
+                continue
+            G.remove_edge(source, target)
+        else:
+            G.add_edge(source, target, weight=weight)
+        affected.update((source, target))
+    # 全件から作り直した場合と同じく、共同出資先がなくなった出資元は除く
+    G.remove_nodes_from([node for node in affected if G.degree(node) == 0])
+    return affected
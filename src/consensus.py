@@ -0,0 +1,137 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+from community.community_louvain import best_partition
+
+from instrumentation import instrumented
+from parallel import process_pool
+
+# ワーカーごとに1回だけ受け取るグラフと解像度
+_worker_graph = None
+_worker_resolution = None
+
+
+def _init_worker(G, resolution):
+    global _worker_graph, _worker_resolution
+    _worker_graph = G
+    _worker_resolution = resolution
+
+
+def _louvain_run(seed):
+    return best_partition(_worker_graph, weight="weight", resolution=_worker_resolution, random_state=seed)
+
+
+# 乱数シードを変えたLouvain法をプロセスプールで並列に実行する関数
+# グラフはワーカーの起動時に1回だけ渡し、タスクごとにはシードだけを送る
+# 戻り値は seeds と同じ順のパーティションのリスト
+@instrumented("louvain_runs")
+def louvain_runs(G, seeds, resolution=1.0, max_workers=None):
+    seeds = list(seeds)
+    if len(seeds) == 1 or max_workers == 1:
+        return [best_partition(G, weight="weight", resolution=resolution, random_state=seed) for seed in seeds]
+    with process_pool(max_workers=max_workers, initializer=_init_worker, initargs=(G, resolution)) as executor:
+        return list(executor.map(_louvain_run, seeds))
+
+
+# 各エッジの両端が同じクラスタに入った実行の割合（共割り当て行列のうちエッジ上の値）を返す関数
+# 全ペアの共割り当て行列は持たず、グラフのエッジについてだけ計算する
+def edge_agreement(G, partitions):
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    labels = np.array([[partition[node] for node in nodes] for partition in partitions])
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+    agreement = (labels[:, edges[:, 0]] == labels[:, edges[:, 1]]).mean(axis=0)
+    return nodes, edges, agreement
+
+
+# クラスタIDを大きい順（同じサイズならノード名順）に0から振り直す関数
+# 実行ごとにLouvain法が付けるIDが変わっても、同じ分割なら同じIDになる
+def canonical_partition(partition):
+    members = {}
+    for node, cluster in partition.items():
+        members.setdefault(cluster, []).append(node)
+    ordered = sorted(members.values(), key=lambda nodes: (-len(nodes), min(map(str, nodes))))
+    return {node: cluster for cluster, nodes in enumerate(ordered) for node in nodes}
+
+
+# 複数回のLouvain法の結果からコンセンサス・パーティションを作る関数（Lancichinetti & Fortunato）
+# 共割り当ての割合が threshold 以上のエッジで重み付けしたグラフに対してLouvain法をやり直し、
+# 全実行の結果が一致するまで繰り返す
+@instrumented("consensus_partition")
+def consensus_partition(G, partitions, threshold=0.5, resolution=1.0, seeds=None,
+                        max_iter=10, max_workers=None):
+    seeds = list(range(len(partitions))) if seeds is None else list(seeds)
+    for _ in range(max_iter):
+        nodes, edges, agreement = edge_agreement(G, partitions)
+        if np.isin(agreement, (0.0, 1.0)).all():
+            break
+        keep = agreement >= threshold
+        C = nx.Graph()
+        C.add_nodes_from(nodes)
+        C.add_weighted_edges_from(
+            (nodes[u], nodes[v], w) for (u, v), w in zip(edges[keep].tolist(), agreement[keep].tolist())
+        )
+        partitions = louvain_runs(C, seeds, resolution, max_workers)
+        G = C
+    else:
+        # 収束しなかった場合は最後の実行結果のうち最初のものを使う
+        return canonical_partition(partitions[0])
+
+    # 全実行で一致したエッジでつながったノードを1つのクラスタにする
+    agreed = nx.Graph()
+    agreed.add_nodes_from(nodes)
+    agreed.add_edges_from((nodes[u], nodes[v]) for u, v in edges[agreement == 1.0].tolist())
+    partition = {}
+    for cluster, component in enumerate(nx.connected_components(agreed)):
+        partition.update(dict.fromkeys(component, cluster))
+    return canonical_partition(partition)
+
+
+# クラスタごとの安定性を返す関数
+# 各実行について、そのクラスタと最もよく一致するクラスタとのジャカード係数を求め、平均と最小を出す
+def cluster_stability(partition, partitions):
+    nodes = list(partition)
+    final = pd.Series([partition[node] for node in nodes], index=nodes)
+    sizes = final.value_counts()
+    scores = []
+    for run in partitions:
+        labels = pd.Series([run[node] for node in nodes], index=nodes)
+        overlap = pd.crosstab(final, labels)
+        intersection = overlap.to_numpy()
+        union = (
+            sizes.loc[overlap.index].to_numpy()[:, None]
+            + labels.value_counts().loc[overlap.columns].to_numpy()[None, :]
+            - intersection
+        )
+        scores.append(pd.Series((intersection / union).max(axis=1), index=overlap.index))
+    scores = pd.concat(scores, axis=1)
+    return pd.DataFrame({
+        "クラスタID": sizes.index,
+        "Nodes": sizes.to_numpy(),
+        "Stability": scores.mean(axis=1).loc[sizes.index].to_numpy(),
+        "Min Stability": scores.min(axis=1).loc[sizes.index].to_numpy(),
+    }).sort_values("クラスタID").reset_index(drop=True)
+
+
+# シードを変えたLouvain法を runs 回並列に実行し、1つのパーティションを返す関数
+# method="best" ならモジュラリティが最大の実行、"consensus" ならコンセンサス・パーティションを使う
+# 戻り値は (パーティション, 各実行のパーティション)
+def stable_partition(G, runs=8, resolution=1.0, random_state=0, method="best",
+                     threshold=0.5, max_workers=None):
+    seeds = range(random_state, random_state + runs)
+    partitions = louvain_runs(G, seeds, resolution, max_workers)
+    if method == "best":
+        modularities = [_modularity(G, partition, resolution) for partition in partitions]
+        partition = partitions[int(np.argmax(modularities))]
+    elif method == "consensus":
+        partition = consensus_partition(G, partitions, threshold, resolution, seeds, max_workers=max_workers)
+    else:
+        raise ValueError(f"Unknown partition method: {method}")
+    return canonical_partition(partition), partitions
+
+
+def _modularity(G, partition, resolution):
+    communities = {}
+    for node, cluster in partition.items():
+        communities.setdefault(cluster, set()).add(node)
+    return nx.algorithms.community.quality.modularity(G, communities.values(), resolution=resolution)
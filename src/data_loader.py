@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from instrumentation import stage
+
+# キャッシュ保存先（CREIのExcelを列指向のFeather形式に変換して保存）
+CACHE_DIR = "data/.cache"
+# キャッシュの形式（変えた場合は古いキャッシュを作り直す）
+CACHE_FORMAT = 2
+
+
+# ファイル内容のハッシュ値を計算する関数
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# キャッシュファイルのパスを返す関数（read_excelの引数ごとに別ファイル）
+def _cache_paths(path, read_kwargs, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    key = json.dumps(read_kwargs, sort_keys=True, default=str, ensure_ascii=False)
+    suffix = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+    base = os.path.join(cache_dir, f"{stem}-{suffix}")
+    return base + ".feather", base + ".json"
+
+
+# Feather(Arrow)で保存できるように型を揃える関数
+# Arrowが受け付けない列（数値と文字列が混在した列など）だけ、各値をJSON文字列にして保存する
+# 戻り値は (変換後のDataFrame, JSON文字列にした列名のリスト)
+def _to_arrow_compatible(df):
+    df = df.reset_index(drop=True)
+    json_columns = []
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda value: json.dumps(value, default=str, ensure_ascii=False))
+            json_columns.append(col)
+    return df, json_columns
+
+
+# キャッシュから読み込んだDataFrameを read_excel と同じ型に戻す関数
+# JSON文字列にした列は元の値に戻し、文字列の列の欠損値は None ではなく NaN にする
+def _from_arrow(df, json_columns):
+    for col in json_columns:
+        df[col] = df[col].map(json.loads).astype(object)
+    for col in df.columns:
+        if df[col].dtype == object and col not in json_columns:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+# キャッシュが元ファイルと一致しているか判定する関数
+# mtimeとサイズが同じなら再利用、変わっていればハッシュで内容を確認する
+def _is_fresh(path, data_path, meta_path):
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != CACHE_FORMAT:
+        return False
+    stat = os.stat(path)
+    if meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size:
+        return True
+    if meta.get("sha1") != file_hash(path):
+        return False
+    # 内容は同じなのでメタ情報だけ更新
+    meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return True
+
+
+# Excelファイルを読み込む関数（初回のみopenpyxlで解析し、以降はキャッシュから読み込む）
+def read_excel_cached(path, cache_dir=CACHE_DIR, **read_kwargs):
+    with stage(f"load:{os.path.basename(path)}") as current:
+        df = _read_excel_cached(path, cache_dir, read_kwargs, current)
+        current.count(rows=len(df), columns=df.shape[1])
+    return df
+
+
+def _read_excel_cached(path, cache_dir, read_kwargs, current):
+    read_kwargs.setdefault("engine", "openpyxl")
+    data_path, meta_path = _cache_paths(path, read_kwargs, cache_dir)
+
+    if _is_fresh(path, data_path, meta_path):
+        current.count(cache_hit=True)
+        with open(meta_path, encoding="utf-8") as f:
+            json_columns = json.load(f).get("json_columns", [])
+        return _from_arrow(pd.read_feather(data_path), json_columns)
+
+    current.count(cache_hit=False)
+
+    df = pd.read_excel(path, **read_kwargs)
+    stored, json_columns = _to_arrow_compatible(df)
+    os.makedirs(cache_dir, exist_ok=True)
+    stored.to_feather(data_path)
+    stat = os.stat(path)
+    meta = {
+        "format": CACHE_FORMAT,
+        "json_columns": json_columns,
+        "source": os.path.abspath(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha1": file_hash(path),
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # data/ 以下のCREIファイルを一括でキャッシュ化
+    import glob
+
+    for excel_path in sorted(glob.glob("data/CREI_*.xlsx")):
+        df = read_excel_cached(excel_path)
+        print(f"{excel_path}: {len(df)} rows cached")
@@ -0,0 +1,129 @@
+import re
+import unicodedata
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from coinvestment import INVESTOR_COL
+from data_loader import file_hash, read_excel_cached
+from graph_store import INVESTOR_ID_COL
+from pipeline import INVESTMENT_PATH, code_version, memoize, stage_key
+
+COMPANY_ID_COL = "企業ID"
+COMPANY_NAME_COL = "企業名"
+ENTITY_ID_COL = "entity_id"
+NAME_KEY_COL = "name_key"
+
+# 法人格の表記（NFKC正規化・小文字化した名前の先頭または末尾から取り除く）
+LEGAL_AFFIXES = [
+    "株式会社", "有限会社", "合同会社", "合資会社", "合名会社",
+    "一般社団法人", "一般財団法人", "公益社団法人", "公益財団法人", "国立大学法人", "学校法人",
+    "(株)", "(有)", "(同)",
+]
+_legal_pattern = re.compile(r"^(?:{0})+|(?:{0})+$".format("|".join(map(re.escape, LEGAL_AFFIXES))))
+# 英語の法人格は単語の区切りの後ろにある場合だけ取り除く（"zinc" の "inc" などは残す）
+_english_legal_pattern = re.compile(
+    r"[\s,]+(?:co\.?,?\s*ltd\.?|pte\.?\s*ltd\.?|ltd\.?|inc\.?|corporation|corp\.?|llc|l\.l\.c\.|k\.k\.|gmbh)$"
+)
+_space_pattern = re.compile(r"[\s,、・]+")
+
+# 名前→正規化した名前（同じ名前は二度処理しない）
+_name_cache = {}
+
+
+# 名前を照合用に正規化する関数
+# NFKC正規化（全角英数・㈱などを統一）→ 小文字化 → 法人格の除去 → 空白と区切り記号の除去
+def normalize_name(name):
+    key = unicodedata.normalize("NFKC", str(name)).lower().strip()
+    stripped = _legal_pattern.sub("", _english_legal_pattern.sub("", key)).strip()
+    # 法人格だけの名前は空にしない
+    return _space_pattern.sub("", stripped or key)
+
+
+# 名前の列をまとめて正規化する関数（一意な値ごとに1回だけ処理する）
+def normalize_names(names):
+    names = pd.Series(names)
+    codes, uniques = pd.factorize(names)
+    new = [name for name in uniques if name not in _name_cache]
+    _name_cache.update((name, normalize_name(name)) for name in new)
+    keys = np.array([_name_cache[name] for name in uniques] + [None], dtype=object)
+    # factorize で欠損値は -1 になるので末尾の None を参照させる
+    return pd.Series(keys[codes], index=names.index)
+
+
+# 正規化した名前 → 出資元・企業ID / 企業ID の対応表
+# IDのない名前（個人や未登録のファンド）には負の整数を振る。負のIDは名前の並び順で決まるので、
+# 名前が1つ増えるだけで他の番号も変わる。同じ対応表の中での結合にだけ使い、保存して後から照合しない
+# 正規化すると同じ名前になる別々のIDの出資元・企業（"X株式会社" と "X合同会社" など）は、
+# どちらかのIDにまとめると別の出資元と取り違えるので対応表から除き、collisions に残す
+class EntityIndex:
+    def __init__(self, table, collisions=None):
+        self.table = table
+        self.collisions = collisions if collisions is not None else pd.DataFrame(columns=[NAME_KEY_COL, "id", "count"])
+        self._ids = pd.Series(table[ENTITY_ID_COL].to_numpy(), index=pd.Index(table[NAME_KEY_COL]))
+        self._lookup = dict(zip(table[NAME_KEY_COL], table[ENTITY_ID_COL].tolist()))
+
+    def __len__(self):
+        return len(self.table)
+
+    # 名前1つを照合する（見つからなければ None）。辞書を引くだけなので定数時間
+    def lookup(self, name):
+        return self._lookup.get(normalize_name(name))
+
+    # 名前の列をIDの列（Int64、見つからなければ欠損値）に変換する
+    def ids(self, names):
+        keys = normalize_names(names)
+        return pd.Series(keys.map(self._ids).to_numpy(), index=keys.index, dtype="Int64")
+
+    # 資金調達情報_出資元 の出資元と出資先企業から作成する
+    @classmethod
+    def from_investments(cls, df, investor_col=INVESTOR_COL, investor_id_col=INVESTOR_ID_COL,
+                         company_col=COMPANY_NAME_COL, company_id_col=COMPANY_ID_COL):
+        pairs = [df[[investor_col, investor_id_col]].set_axis(["name", "id"], axis=1)]
+        if company_col in df and company_id_col in df:
+            pairs.append(df[[company_col, company_id_col]].set_axis(["name", "id"], axis=1))
+        names = pd.concat(pairs, ignore_index=True).dropna(subset=["name"])
+        names["id"] = pd.to_numeric(names["id"], errors="coerce").astype("Int64")
+        names[NAME_KEY_COL] = normalize_names(names["name"]).to_numpy()
+
+        with_id = names.dropna(subset=["id"])
+        counts = (
+            with_id.groupby([NAME_KEY_COL, "id"]).size().rename("count").reset_index()
+            .sort_values([NAME_KEY_COL, "count", "id"], ascending=[True, False, True])
+        )
+        ambiguous = counts.duplicated(NAME_KEY_COL, keep=False)
+        collisions = counts[ambiguous].reset_index(drop=True)
+        known = counts[~ambiguous]
+        colliding_keys = collisions[NAME_KEY_COL].unique()
+        if len(colliding_keys):
+            warnings.warn(
+                f"{len(colliding_keys)} normalized names map to several IDs and are left out of the index "
+                f"(e.g. {', '.join(map(str, colliding_keys[:5]))}); see EntityIndex.collisions",
+                stacklevel=2,
+            )
+        unknown = pd.Index(names[NAME_KEY_COL].unique()).difference(known[NAME_KEY_COL]).difference(colliding_keys)
+        table = pd.concat([
+            pd.DataFrame({NAME_KEY_COL: known[NAME_KEY_COL].to_numpy(), ENTITY_ID_COL: known["id"].to_numpy()}),
+            pd.DataFrame({NAME_KEY_COL: unknown.to_numpy(), ENTITY_ID_COL: -np.arange(1, len(unknown) + 1)}),
+        ], ignore_index=True)
+        table[ENTITY_ID_COL] = table[ENTITY_ID_COL].astype("int64")
+        return cls(table, collisions)
+
+
+# 出資元データから対応表を作成し、ディスクに保存する関数（元ファイルが変わらない限り再作成しない）
+def load_entity_index(file_path=INVESTMENT_PATH):
+    key = stage_key("entity_index", code_version(EntityIndex.from_investments), file_hash(file_path))
+
+    def build():
+        index = EntityIndex.from_investments(read_excel_cached(file_path))
+        return index.table, index.collisions
+
+    return EntityIndex(*memoize("entity_index", key, build))
+
+
+# DataFrame の名前の列を照合して整数のIDの列を追加する関数
+def attach_ids(df, name_col, index, id_col=ENTITY_ID_COL):
+    df = df.copy()
+    df[id_col] = index.ids(df[name_col]).to_numpy()
+    return df
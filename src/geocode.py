@@ -1,6 +1,8 @@
 import pandas as pd
-import folium  # 地図表示用
 import random
+from entity_index import load_entity_index
+from map_writer import join_geocode_by_id, write_cluster_map
+from spatial import cluster_geo_stats
 # ファイルパス設定
 # clustered_nodes_path = "kcore_clustered_nodes.csv"  # クラスタリング結果
 clustered_nodes_path = "updated_kcore_clustered_nodes.csv"  # クラスタリング結果
@@ -14,31 +16,18 @@ geocode_df = pd.read_csv(geocode_path)
 clusters = sorted(clustered_nodes['クラスタID'].unique())
 cluster_colors = {cluster: f"#{''.join(random.choices('0123456789ABCDEF', k=6))}" for cluster in clusters}
 
-# Foliumマップ作成
-m = folium.Map(location=[35.6895, 139.6917], zoom_start=11)  # 東京を中心に地図を初期化
-
-# 企業ごとに地図上にプロット
-for _, row in clustered_nodes.iterrows():
-    company_name = row['企業名']
-    cluster_id = row['クラスタID']
-    node_color = cluster_colors[cluster_id]
-
-    # 対応する地理情報を取得
-    node_geocode = geocode_df[geocode_df['company_name'] == company_name]
-    if not node_geocode.empty:
-        lon = node_geocode['lon'].iloc[0]
-        lat = node_geocode['lat'].iloc[0]
-        folium.CircleMarker(
-            location=[lat, lon],
-            radius=5,
-            color=node_color,
-            fill=True,
-            fill_color=node_color,
-            fill_opacity=0.7,
-            popup=folium.Popup(f"{company_name} (Cluster {cluster_id})", max_width=300)
-        ).add_to(m)
+# 正規化した企業名から求めたIDで地理情報を一括結合（見つからない企業は除外）
+entity_index = load_entity_index()
+points = join_geocode_by_id(clustered_nodes, geocode_df, entity_index)
 
 # 地図を保存または表示
+# ノード数が多い場合はクラスタごとのGeoJSONレイヤーで描画する（map_mode="cluster" でマーカークラスタ）
 map_file = "clustered_nodes_map.html"
-m.save(map_file)
+map_mode = "auto"
+write_cluster_map(points, map_file, cluster_colors, mode=map_mode)
 print(f"Map has been saved as {map_file}. Open it in your browser to view.")
+
+# クラスタごとの地理的なまとまり（重心・ばらつき・密度・近傍の同クラスタ割合）を保存
+geo_stats_file = "cluster_geo_stats.csv"
+cluster_geo_stats(points).to_csv(geo_stats_file, index=False)
+print(f"Cluster geographic statistics saved as {geo_stats_file}")
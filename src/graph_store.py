@@ -0,0 +1,137 @@
+import json
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from coinvestment import ROUND_COL, INVESTOR_COL
+
+INVESTOR_ID_COL = "出資元・企業ID"
+NODE_ID_COL = "node_id"
+
+
+# 出資元を int32 のノードIDに変換する関数
+# 出資元・企業IDがあればそれをキーにし、なければ企業名をキーにする
+# 戻り値は (各行のノードID, ノード表)
+def intern_investors(df, investor_col=INVESTOR_COL, id_col=INVESTOR_ID_COL):
+    ids = pd.to_numeric(df[id_col], errors="coerce").astype("Int64")
+    key = ("id:" + ids.astype("string")).fillna("name:" + df[investor_col].astype("string"))
+    codes, uniques = pd.factorize(key)
+    first_rows = pd.Series(np.arange(len(df))).groupby(codes).first().to_numpy()
+    nodes = pd.DataFrame({
+        NODE_ID_COL: np.arange(len(uniques), dtype=np.int32),
+        id_col: ids.to_numpy()[first_rows],
+        investor_col: df[investor_col].to_numpy()[first_rows],
+    })
+    nodes[id_col] = nodes[id_col].astype("Int64")
+    return codes.astype(np.int32), nodes
+
+
+# CSR形式の隣接配列とノード表で保持するコンパクトなグラフ
+class CompactGraph:
+    def __init__(self, indptr, indices, weights, nodes):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.nodes = nodes
+
+    @property
+    def number_of_nodes(self):
+        return len(self.indptr) - 1
+
+    @property
+    def number_of_edges(self):
+        return len(self.indices) // 2
+
+    # 疎行列として返す（配列はコピーしない）
+    def adjacency(self):
+        n = self.number_of_nodes
+        return sp.csr_matrix((self.weights, self.indices, self.indptr), shape=(n, n), copy=False)
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def neighbors(self, node_id):
+        start, stop = self.indptr[node_id], self.indptr[node_id + 1]
+        return self.indices[start:stop], self.weights[start:stop]
+
+    # 企業名からノードIDを引く（同名の出資元が複数あれば全て返す）
+    def lookup(self, name, name_col=INVESTOR_COL):
+        return self.nodes.loc[self.nodes[name_col] == name, NODE_ID_COL].to_numpy()
+
+    # 対称な隣接行列とノード表から作成する
+    @classmethod
+    def from_adjacency(cls, A, nodes):
+        A = sp.csr_matrix(A)
+        A.sum_duplicates()
+        A.sort_indices()
+        return cls(
+            A.indptr.astype(np.int64),
+            A.indices.astype(np.int32),
+            A.data.astype(np.float32),
+            nodes.reset_index(drop=True),
+        )
+
+    # 出資元データから共同出資グラフを作成する
+    @classmethod
+    def from_investments(cls, df, round_col=ROUND_COL, investor_col=INVESTOR_COL, id_col=INVESTOR_ID_COL):
+        df = df.dropna(subset=[round_col, investor_col]).reset_index(drop=True)
+        investor_codes, nodes = intern_investors(df, investor_col, id_col)
+        round_codes, rounds = pd.factorize(df[round_col])
+        B = sp.csr_matrix(
+            (np.ones(len(df), dtype=np.int32), (round_codes, investor_codes)),
+            shape=(len(rounds), len(nodes)),
+        )
+        B.data[:] = 1
+        A = (B.T @ B).tocsr()
+        A.setdiag(0)
+        A.eliminate_zeros()
+        return cls.from_adjacency(A, nodes)
+
+    # networkxのグラフから作成する（ノードは企業名を想定）
+    # investors に出資元データを渡すと出資元・企業IDも付与する
+    @classmethod
+    def from_networkx(cls, G, investors=None, weight="weight", investor_col=INVESTOR_COL, id_col=INVESTOR_ID_COL):
+        names = list(G.nodes())
+        nodes = pd.DataFrame({
+            NODE_ID_COL: np.arange(len(names), dtype=np.int32),
+            investor_col: names,
+        })
+        if investors is not None:
+            name_to_id = investors.dropna(subset=[investor_col]).drop_duplicates(investor_col).set_index(investor_col)[id_col]
+            nodes.insert(1, id_col, nodes[investor_col].map(name_to_id).astype("Int64"))
+        for attr in sorted({key for _, data in G.nodes(data=True) for key in data}):
+            nodes[attr] = [G.nodes[name].get(attr) for name in names]
+        A = nx.to_scipy_sparse_array(G, nodelist=names, weight=weight, format="csr")
+        return cls.from_adjacency(A, nodes)
+
+    # networkxのグラフに戻す（label列の値をノード名にする）
+    def to_networkx(self, label=INVESTOR_COL):
+        A = self.adjacency()
+        G = nx.from_scipy_sparse_array(A)
+        if label is not None:
+            G = nx.relabel_nodes(G, dict(enumerate(self.nodes[label])))
+        return G
+
+    # ディレクトリに保存する
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "indptr.npy"), np.asarray(self.indptr))
+        np.save(os.path.join(path, "indices.npy"), np.asarray(self.indices))
+        np.save(os.path.join(path, "weights.npy"), np.asarray(self.weights))
+        self.nodes.to_feather(os.path.join(path, "nodes.feather"))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"nodes": self.number_of_nodes, "edges": self.number_of_edges}, f)
+
+    # ディレクトリから読み込む（隣接配列はメモリマップで開く）
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(path, "indptr.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "indices.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "weights.npy"), mmap_mode=mmap_mode),
+            pd.read_feather(os.path.join(path, "nodes.feather")),
+        )
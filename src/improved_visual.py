@@ -1,14 +1,10 @@
-import networkx as nx
 import matplotlib.pyplot as plt
-import pandas as pd
-import random
 from matplotlib import font_manager
-from networkx.algorithms.link_prediction import jaccard_coefficient
-from community.community_louvain import best_partition
+from pipeline import run_pipeline
+from centrality import CentralityService
 
 # データ読み込み
 file_path = "data/CREI_資金調達情報_出資元_2022_04_21.xlsx"
-df = pd.read_excel(file_path, engine='openpyxl')
 
 # フォント設定
 font_path = "ipaexg.ttf"
@@ -17,61 +13,24 @@ plt.rcParams['font.family'] = font_prop.get_name()
 plt.rcParams['axes.unicode_minus'] = False
 print("Font set")
 
-# グラフ作成
-G = nx.Graph()
-for funding_id in df['資金調達ID'].unique():
-    subset = df[df['資金調達ID'] == funding_id]
-    investor_companies = subset['出資元・企業名'].unique()
-    for i in range(len(investor_companies)):
-        for j in range(i + 1, len(investor_companies)):
-            G.add_edge(investor_companies[i], investor_companies[j], weight=1)
-
-# ジャカード係数でエッジを追加（計算コスト削減）
-edges_to_add = []
-for u, v, p in jaccard_coefficient(G):
-    if p >= 0.3:
-        edges_to_add.append((u, v, p))
-G.add_weighted_edges_from(edges_to_add)
-
-# Kコア分割でノード数を制限
+# 共同出資グラフ → ジャカード係数 → Kコア → Louvain法（各段階の結果はキャッシュされる）
+# Louvain法はシードを固定して8回並列に実行し、モジュラリティが最大の結果を使う
+threshold = 0.3
 k = 3
-G = nx.k_core(G, k)
-
-# Louvain法でクラスタリング
-partition = best_partition(G, weight='weight')
+result = run_pipeline(file_path, threshold=threshold, k=k, random_state=0, runs=8)
+G = result.graph
+partition = result.partition
 
-# モジュラリティ計算
-modularity = nx.algorithms.community.quality.modularity(G, [{n for n in partition if partition[n] == c} for c in set(partition.values())])
+# モジュラリティ
+modularity = result.modularity
 print(f"Modularity of the network: {modularity}")
 
-# クラスタ統計情報の計算
-cluster_stats = []
-for cluster in set(partition.values()):
-    nodes_in_cluster = [node for node in G.nodes() if partition[node] == cluster]
-    subgraph = G.subgraph(nodes_in_cluster)  # クラスタの部分グラフを抽出
-    
-    # ノード数とエッジ数
-    num_nodes = subgraph.number_of_nodes()
-    num_edges = subgraph.number_of_edges()
-    
-    # 中心性指標
-    degree_centrality = nx.degree_centrality(subgraph)
-    betweenness_centrality = nx.betweenness_centrality(subgraph)
-    closeness_centrality = nx.closeness_centrality(subgraph)
-    eigenvector_centrality = nx.eigenvector_centrality(subgraph, max_iter=500)
-    
-    cluster_stats.append({
-        'Cluster': cluster,
-        'Nodes': num_nodes,
-        'Edges': num_edges,
-        'Average Degree Centrality': sum(degree_centrality.values()) / num_nodes,
-        'Average Betweenness Centrality': sum(betweenness_centrality.values()) / num_nodes,
-        'Average Closeness Centrality': sum(closeness_centrality.values()) / num_nodes,
-        'Average Eigenvector Centrality': sum(eigenvector_centrality.values()) / num_nodes,
-    })
+# クラスタ統計情報の計算（クラスタごとにワーカープロセスで並列計算）
+# 媒介中心性と近接中心性はピボットをサンプリングした近似値（ピボット数は centrality.pivot_count を参照）
+centrality = CentralityService(G, partition, approx=True, epsilon=0.05)
+cluster_stats_df = centrality.cluster_summary()
 
-# クラスタ統計情報をデータフレームに変換して表示
-cluster_stats_df = pd.DataFrame(cluster_stats)
+# クラスタ統計情報を表示
 print(cluster_stats_df)
 
 # CSVに保存
@@ -0,0 +1,112 @@
+import argparse
+from functools import lru_cache
+
+import networkx as nx
+import pandas as pd
+from community.community_louvain import best_partition
+
+from data_loader import file_hash, read_excel_cached
+from coinvestment import apply_coinvestment_delta, coinvestment_delta
+from jaccard import jaccard_edges, jaccard_edges_for
+from pipeline import (
+    CACHE_DIR, PipelineResult, code_version, coinvestment_stage, memoize,
+    partition_modularity, run_pipeline, stage_key,
+)
+
+
+# 前回のジャカード係数のうち、隣接ノードが変わった出資元を含まないペアを残し、
+# 変わった出資元を含むペアだけを計算し直す関数
+def update_jaccard(G, previous_jaccard, affected, threshold):
+    kept = [
+        (u, v, p) for u, v, p in previous_jaccard
+        if u not in affected and v not in affected
+    ]
+    return kept + jaccard_edges_for(G, affected, threshold)
+
+
+# 前回のパーティションを初期値にする関数（新しく加わった出資元は1社ずつ別のクラスタにする）
+def warm_start_partition(G, previous_partition):
+    next_cluster = max(previous_partition.values(), default=-1) + 1
+    partition = {}
+    for node in G:
+        if node in previous_partition:
+            partition[node] = previous_partition[node]
+        else:
+            partition[node] = next_cluster
+            next_cluster += 1
+    return partition
+
+
+# 前回のスナップショットとの差分を反映して 共同出資グラフ → ジャカード係数 → Kコア → Louvain法 を更新する関数
+# 差分に比例する計算で済むのは共同出資グラフとジャカード係数の更新だけで、
+# Kコアと（前回のパーティションから開始する）Louvain法は更新後のグラフ全体に対して実行する
+# 更新したグラフはノードとエッジの順序が全件から作り直した場合と異なり、シードを固定したLouvain法の結果も変わるため、
+# run_pipeline とは別の（前回のスナップショットを含む）キャッシュキーで保存する
+# previous_partition を省略した場合は前回のスナップショットの run_pipeline の結果から開始する
+def refresh_pipeline(previous_path, file_path, threshold=0.3, k=3, resolution=1.0,
+                     random_state=None, previous_partition=None, cache_dir=CACHE_DIR):
+    previous_G, previous_build_key = coinvestment_stage(previous_path, cache_dir)
+    previous_jaccard = memoize(
+        "jaccard", stage_key(previous_build_key, "jaccard", code_version(jaccard_edges), threshold),
+        lambda: jaccard_edges(previous_G, threshold),
+        cache_dir,
+    )
+    if previous_partition is None:
+        previous_partition = run_pipeline(
+            previous_path, threshold, k, resolution, random_state, cache_dir=cache_dir,
+        ).partition
+
+    # 差分の計算は、新しいスナップショットの段階がキャッシュにない場合だけ行う
+    @lru_cache(maxsize=None)
+    def update():
+        delta = coinvestment_delta(read_excel_cached(previous_path), read_excel_cached(file_path))
+        affected = apply_coinvestment_delta(previous_G, delta)
+        return previous_G, affected
+
+    version = code_version(coinvestment_delta, jaccard_edges_for, update_jaccard)
+    build_key = stage_key("incremental", previous_build_key, version, file_hash(file_path))
+    jaccard_key = stage_key(build_key, "jaccard", threshold)
+    kcore_key = stage_key(jaccard_key, "kcore", k)
+
+    G = memoize("incremental_coinvestment", build_key, lambda: update()[0], cache_dir)
+    jaccard = memoize(
+        "incremental_jaccard", jaccard_key,
+        lambda: update_jaccard(G, previous_jaccard, update()[1], threshold),
+        cache_dir,
+    )
+    # G は保存済みで以降使わないので、コピーせずにジャカード係数のエッジを加える
+    core = memoize("incremental_kcore", kcore_key, lambda: _kcore_in_place(G, jaccard, k), cache_dir)
+
+    partition = best_partition(
+        core, partition=warm_start_partition(core, previous_partition),
+        weight="weight", resolution=resolution, random_state=random_state,
+    )
+    keys = {"coinvestment": build_key, "jaccard": jaccard_key, "kcore": kcore_key, "louvain": None}
+    return PipelineResult(core, partition, partition_modularity(core, partition), keys)
+
+
+def _kcore_in_place(G, jaccard, k):
+    G.add_weighted_edges_from(jaccard)
+    return nx.k_core(G, k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="新しいCREIスナップショットの差分を反映してネットワークを更新する")
+    parser.add_argument("previous", help="前回の 資金調達情報_出資元 のExcelファイル")
+    parser.add_argument("current", help="新しい 資金調達情報_出資元 のExcelファイル")
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--resolution", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="kcore_clustered_nodes.csv")
+    args = parser.parse_args()
+
+    result = refresh_pipeline(args.previous, args.current, threshold=args.threshold, k=args.k,
+                              resolution=args.resolution, random_state=args.seed)
+    print(f"K-core: {result.graph.number_of_nodes()} nodes, {result.graph.number_of_edges()} edges")
+    print(f"Clusters: {len(set(result.partition.values()))}")
+    print(f"Modularity of the network: {result.modularity}")
+
+    clustered_nodes = pd.DataFrame({'企業名': list(result.partition.keys()), 'クラスタID': list(result.partition.values())})
+    clustered_nodes.to_csv(args.output, index=False)
+    print(f"Clusters saved as {args.output}")
@@ -0,0 +1,186 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# この環境変数を設定すると計測を有効にする（値はJSONレポートの保存先。"1" なら run_report.json）
+REPORT_ENV = "RUN_REPORT"
+# 計測が有効なときにこの環境変数を設定すると cProfile の結果も保存する（値は .prof の保存先）
+PROFILE_ENV = "RUN_PROFILE"
+DEFAULT_REPORT_PATH = "run_report.json"
+
+_report = None
+
+
+# 1回の実行の計測結果（段階ごとの実行時間・CPU時間・RSS・件数）
+class RunReport:
+    def __init__(self, path, profile_path=None):
+        self.path = path
+        self.profile_path = profile_path
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.stages = []
+        self.depth = 0
+        self.profiler = cProfile.Profile() if profile_path else None
+        if self.profiler:
+            self.profiler.enable()
+
+    def record(self, row):
+        self.stages.append(row)
+
+    def to_dict(self):
+        return {
+            "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            "argv": sys.argv[1:],
+            "started": self.started,
+            "wall_seconds": time.perf_counter() - self.start_wall,
+            "cpu_seconds": time.process_time() - self.start_cpu,
+            "process_peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "stages": self.stages,
+        }
+
+    def write(self):
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_path)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+        print(f"Run report saved as {self.path}", file=sys.stderr)
+
+
+# プロセス開始からの最大常駐メモリ（MB）。段階ごとの値ではなく、その時点までのプロセス全体の最大値
+# who=RUSAGE_CHILDREN なら終了を待った子プロセス（ワーカー）のうち最大のもの
+# Linux では KB、macOS では バイト単位で返るので換算する
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    unit = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * unit / 2 ** 20
+
+
+# 現在の常駐メモリ（MB）。/proc のない環境では None
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+# 計測を有効にする関数（環境変数 RUN_REPORT が設定されていれば import 時に自動で呼ばれる）
+def enable(path=DEFAULT_REPORT_PATH, profile_path=None):
+    global _report
+    if _report is None:
+        _report = RunReport(path, profile_path)
+        atexit.register(_report.write)
+    return _report
+
+
+def enabled():
+    return _report is not None
+
+
+# 段階の結果から件数（行数・ノード数・エッジ数・クラスタ数など）を取り出す関数
+def describe(result):
+    if hasattr(result, "number_of_nodes") and callable(result.number_of_nodes):
+        return {"nodes": result.number_of_nodes(), "edges": result.number_of_edges()}
+    if hasattr(result, "number_of_nodes"):  # CompactGraph
+        return {"nodes": result.number_of_nodes, "edges": result.number_of_edges}
+    if hasattr(result, "shape") and hasattr(result, "columns"):  # DataFrame
+        return {"rows": result.shape[0]}
+    if isinstance(result, dict):
+        values = list(result.values())
+        if values and all(isinstance(value, int) for value in values[:100]):  # パーティション
+            return {"nodes": len(result), "clusters": len(set(values))}
+        return {"items": len(result)}
+    if isinstance(result, tuple) and result:
+        return describe(result[0])
+    if isinstance(result, list):
+        return {"items": len(result)}
+    return {}
+
+
+# 計測中の段階（件数を追加できる）
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+    def describe(self, result):
+        self.counts.update(describe(result))
+        return result
+
+
+class _NullStage:
+    def count(self, **counts):
+        pass
+
+    def describe(self, result):
+        return result
+
+
+_NULL_STAGE = _NullStage()
+
+
+# 段階の実行時間・CPU時間・RSS・件数を記録するコンテキストマネージャ
+# rss_start_mb / rss_end_mb / rss_delta_mb は段階の前後の現在のRSS、
+# new_peak_rss_mb はこの段階の間にプロセスの最大RSSが更新された場合の新しい最大値（更新されなければ None）
+# 計測が無効な場合は何もしない
+#     with stage("jaccard") as s:
+#         jaccard = jaccard_edges(G, threshold)
+#         s.count(pairs=len(jaccard))
+@contextmanager
+def stage(name, **counts):
+    if _report is None:
+        yield _NULL_STAGE
+        return
+    current = _Stage(name)
+    current.count(**counts)
+    depth = _report.depth
+    _report.depth += 1
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    start_rss, start_peak = current_rss_mb(), peak_rss_mb()
+    try:
+        yield current
+    finally:
+        _report.depth -= 1
+        end_rss, end_peak = current_rss_mb(), peak_rss_mb()
+        _report.record({
+            "stage": name,
+            "depth": depth,
+            "wall_seconds": time.perf_counter() - start_wall,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "rss_start_mb": start_rss,
+            "rss_end_mb": end_rss,
+            "rss_delta_mb": None if start_rss is None or end_rss is None else end_rss - start_rss,
+            "new_peak_rss_mb": end_peak if end_peak > start_peak else None,
+            **current.counts,
+        })
+
+
+# 関数の呼び出しを1つの段階として記録するデコレータ（戻り値から件数を取り出す）
+def instrumented(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _report is None:
+                return func(*args, **kwargs)
+            with stage(name) as current:
+                return current.describe(func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+if os.environ.get(REPORT_ENV):
+    _path = os.environ[REPORT_ENV]
+    enable(DEFAULT_REPORT_PATH if _path == "1" else _path, os.environ.get(PROFILE_ENV))
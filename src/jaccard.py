@@ -0,0 +1,87 @@
+from collections import Counter
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+
+# 隣接行列を0/1の対称行列（自己ループなし）に正規化する関数
+def _binary_adjacency(A):
+    A = sp.csr_matrix(A, copy=True)
+    A.setdiag(0)
+    A.eliminate_zeros()
+    A.data[:] = 1
+    return A
+
+
+# 疎な隣接行列からジャカード係数が閾値以上の非隣接ペアを返す関数
+# 共通の隣接ノードを持つペアだけを A·A で列挙し、和集合は次数から求める
+# 行をchunk_sizeごとに処理するので、全ペアを一度に持つことはない
+# 戻り値は (行番号, 列番号, ジャカード係数) の配列（行番号 < 列番号）
+def jaccard_pairs(A, threshold, chunk_size=2048):
+    A = _binary_adjacency(A)
+    n = A.shape[0]
+    degree = np.asarray(A.sum(axis=1)).ravel()
+
+    rows, cols, scores = [], [], []
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        shared = (A[start:stop] @ A).tocoo()
+        u = shared.row + start
+        v = shared.col
+        upper = v > u
+        u, v, intersection = u[upper], v[upper], shared.data[upper]
+
+        score = intersection / (degree[u] + degree[v] - intersection)
+        keep = score >= threshold
+        u, v, score = u[keep], v[keep], score[keep]
+
+        # networkxのjaccard_coefficientと同様に既存エッジは対象外
+        if len(u):
+            non_edge = np.asarray(A[u, v]).ravel() == 0
+            u, v, score = u[non_edge], v[non_edge], score[non_edge]
+
+        rows.append(u)
+        cols.append(v)
+        scores.append(score)
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+
+
+# networkxのグラフから (u, v, ジャカード係数) のエッジリストを返す関数
+def jaccard_edges(G, threshold, chunk_size=2048):
+    nodes = list(G.nodes())
+    A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=None, format="csr")
+    rows, cols, scores = jaccard_pairs(A, threshold, chunk_size)
+    return [(nodes[u], nodes[v], p) for u, v, p in zip(rows, cols, scores.tolist())]
+
+
+# 指定したノードを端点に持つペアだけについて (u, v, ジャカード係数) を返す関数
+# 2ホップ先までしかたどらないので、計算量は指定したノードの周辺の大きさに比例する
+# 両端とも指定されたペアは1回だけ返す
+def jaccard_edges_for(G, nodes, threshold):
+    def neighbors(node):
+        return set(G[node]) - {node}
+
+    def degree(node):
+        return len(G[node]) - (node in G[node])
+
+    edges = []
+    done = set()
+    for u in nodes:
+        if u not in G:
+            continue
+        u_neighbors = neighbors(u)
+        shared = Counter()
+        for w in u_neighbors:
+            shared.update(neighbors(w) - {u})
+        for v, intersection in shared.items():
+            if v in done or v in u_neighbors:
+                continue
+            score = intersection / (len(u_neighbors) + degree(v) - intersection)
+            if score >= threshold:
+                edges.append((u, v, score))
+        done.add(u)
+    return edges
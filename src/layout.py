@@ -0,0 +1,156 @@
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+from instrumentation import instrumented
+from parallel import process_pool
+from pipeline import CACHE_DIR, code_version, memoize, stage_key
+
+# これを超えるノード数のクラスタはグリッド近似の力学モデルで配置する
+LARGE_CLUSTER_SIZE = 1000
+
+
+# 格子で斥力を近似する Fruchterman-Reingold レイアウト
+# 引力はエッジについてだけ、斥力は grid × grid の各セルの重心からまとめて受けるので、
+# 1反復あたりの計算量は O(ノード数 × セル数 + エッジ数) になる（全ペアは計算しない）
+def sparse_force_layout(G, iterations=50, seed=42, grid=16, chunk_size=4096):
+    nodes = list(G.nodes())
+    n = len(nodes)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {nodes[0]: np.zeros(2)}
+
+    A = sp.coo_matrix(nx.to_scipy_sparse_array(G, nodelist=nodes, weight="weight"))
+    upper = A.row < A.col
+    rows, cols, weights = A.row[upper], A.col[upper], A.data[upper].astype(float)
+
+    pos = np.random.default_rng(seed).random((n, 2))
+    k = np.sqrt(1.0 / n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        displacement = np.zeros((n, 2))
+
+        # 斥力：セルごとの重心と個数で近似する
+        low, high = pos.min(axis=0), pos.max(axis=0)
+        cell = np.minimum(((pos - low) / np.maximum(high - low, 1e-9) * grid).astype(int), grid - 1)
+        cell_id = cell[:, 0] * grid + cell[:, 1]
+        counts = np.bincount(cell_id, minlength=grid * grid)
+        occupied = np.flatnonzero(counts)
+        centroids = np.stack([
+            np.bincount(cell_id, weights=pos[:, axis], minlength=grid * grid)[occupied] / counts[occupied]
+            for axis in range(2)
+        ], axis=1)
+        masses = counts[occupied].astype(float)
+        for start in range(0, n, chunk_size):
+            delta = pos[start:start + chunk_size, None, :] - centroids[None, :, :]
+            distance2 = np.maximum((delta ** 2).sum(axis=2), 1e-6)
+            displacement[start:start + chunk_size] += (delta * (masses * k ** 2 / distance2)[:, :, None]).sum(axis=1)
+
+        # 引力：エッジの両端を重みに比例して引き寄せる
+        delta = pos[rows] - pos[cols]
+        distance = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+        force = delta * (weights * distance / k)[:, None]
+        np.add.at(displacement, rows, -force)
+        np.add.at(displacement, cols, force)
+
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 1e-9)
+        pos += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    pos /= max(np.abs(pos).max(), 1e-9)
+    return dict(zip(nodes, pos))
+
+
+# 1つのクラスタ内のレイアウトを計算する関数（ワーカープロセスで実行）
+# 座標は原点中心・半径1に正規化して返す
+def _local_layout(args):
+    subgraph, seed, large_cluster_size = args
+    if subgraph.number_of_nodes() > large_cluster_size:
+        pos = sparse_force_layout(subgraph, seed=seed)
+    else:
+        pos = nx.spring_layout(subgraph, seed=seed)
+    if not pos:
+        return pos
+    coords = np.array(list(pos.values()))
+    coords -= coords.mean(axis=0)
+    coords /= max(np.abs(coords).max(), 1e-9)
+    return dict(zip(pos, coords))
+
+
+# クラスタを1点に縮約したグラフ（エッジの重みはクラスタ間のエッジ重みの合計）
+def condensed_graph(G, partition, weight="weight"):
+    C = nx.Graph()
+    for cluster in set(partition.values()):
+        C.add_node(cluster, size=0)
+    for node in G:
+        C.nodes[partition[node]]["size"] += 1
+    for u, v, w in G.edges(data=weight, default=1):
+        cu, cv = partition[u], partition[v]
+        if cu == cv:
+            continue
+        if C.has_edge(cu, cv):
+            C[cu][cv]["weight"] += w
+        else:
+            C.add_edge(cu, cv, weight=w)
+    return C
+
+
+# 階層的レイアウト：縮約したクラスタグラフで各クラスタの位置を決め、
+# クラスタ内のノードはクラスタごとにワーカープロセスで並列に配置する
+# クラスタの半径はノード数の平方根に比例させ、隣のクラスタと重ならない大きさにする
+@instrumented("layout")
+def hierarchical_layout(G, partition, seed=42, large_cluster_size=LARGE_CLUSTER_SIZE, max_workers=None):
+    if G.number_of_nodes() == 0:
+        return {}
+    C = condensed_graph(G, partition)
+    centers = nx.spring_layout(C, weight="weight", seed=seed)
+    center_coords = np.array([centers[cluster] for cluster in C])
+    if len(C) > 1:
+        gaps = np.linalg.norm(center_coords[:, None] - center_coords[None, :], axis=2)
+        spacing = gaps[np.triu_indices(len(C), k=1)].min()
+    else:
+        spacing = 1.0
+    max_size = max(size for _, size in C.nodes(data="size"))
+
+    members = {}
+    for node in G:
+        members.setdefault(partition[node], []).append(node)
+    # 大きいクラスタから投入して待ち時間を減らす
+    clusters = sorted(members, key=lambda cluster: -len(members[cluster]))
+    tasks = [(G.subgraph(members[cluster]).copy(), seed, large_cluster_size) for cluster in clusters]
+    if max_workers == 1 or len(tasks) == 1:
+        local = [_local_layout(task) for task in tasks]
+    else:
+        with process_pool(max_workers=max_workers) as executor:
+            local = list(executor.map(_local_layout, tasks))
+
+    pos = {}
+    for cluster, local_pos in zip(clusters, local):
+        radius = 0.45 * spacing * np.sqrt(C.nodes[cluster]["size"] / max_size)
+        for node, xy in local_pos.items():
+            pos[node] = centers[cluster] + radius * xy
+    return pos
+
+
+# グラフとパーティションの内容からレイアウトのキャッシュキーを作る関数
+def graph_key(G, partition):
+    nodes = sorted((str(node), partition[node]) for node in G)
+    edges = sorted(tuple(sorted((str(u), str(v)))) for u, v in G.edges())
+    return stage_key(nodes, edges)
+
+
+# レイアウトを計算してディスクに保存する関数（同じグラフ・パーティション・パラメータなら再計算しない）
+# key には run_pipeline の keys["louvain"] のような、グラフとパーティションを特定できる値を渡せる
+def cached_layout(G, partition, key=None, seed=42, large_cluster_size=LARGE_CLUSTER_SIZE,
+                  max_workers=None, cache_dir=CACHE_DIR):
+    if key is None:
+        key = graph_key(G, partition)
+    layout_key = stage_key(key, "layout", code_version(hierarchical_layout), seed, large_cluster_size, G.number_of_nodes())
+    return memoize(
+        "layout", layout_key,
+        lambda: hierarchical_layout(G, partition, seed, large_cluster_size, max_workers),
+        cache_dir,
+    )
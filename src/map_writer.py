@@ -0,0 +1,110 @@
+import folium  # 地図表示用
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+from entity_index import ENTITY_ID_COL
+from instrumentation import instrumented
+
+# これを超えるノード数では1点ずつのマーカーではなくGeoJSONレイヤーで描画する
+HIGH_VOLUME_THRESHOLD = 2000
+
+# FastMarkerCluster 用のマーカー生成関数（row = [lat, lon, color, popup]）
+_FAST_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 5, color: row[2], fillColor: row[2], fill: true, fillOpacity: 0.7
+    });
+    marker.bindPopup(row[3]);
+    return marker;
+}
+"""
+
+
+# 対応表（index）を使って緯度経度を結合する関数
+# 地理情報の 出資元・企業ID をそのまま使い、IDがない行だけ
+# company_name と全角表記の corporate_name のどちらかを照合してIDを求める
+def join_geocode_by_id(clustered_nodes, geocode_df, index, name_col='企業名', geocode_id_col='出資元・企業ID',
+                       geocode_name_cols=('company_name', 'corporate_name')):
+    geocode_df = geocode_df.dropna(subset=['lat', 'lon'])
+    if geocode_id_col in geocode_df:
+        ids = pd.to_numeric(geocode_df[geocode_id_col], errors='coerce').astype("Int64")
+    else:
+        ids = pd.Series(pd.NA, index=geocode_df.index, dtype="Int64")
+    for col in geocode_name_cols:
+        if col in geocode_df and ids.isna().any():
+            ids = ids.fillna(index.ids(geocode_df[col]))
+    locations = (
+        geocode_df.assign(**{ENTITY_ID_COL: ids})
+        .dropna(subset=[ENTITY_ID_COL])
+        .drop_duplicates(ENTITY_ID_COL)
+        .set_index(ENTITY_ID_COL)[['lat', 'lon']]
+    )
+    points = clustered_nodes.assign(**{ENTITY_ID_COL: index.ids(clustered_nodes[name_col]).to_numpy()})
+    return points.join(locations, on=ENTITY_ID_COL, how='inner').drop(columns=ENTITY_ID_COL)
+
+
+# 1点ずつ CircleMarker を追加する（少数のノード向け）
+def _add_markers(m, points, cluster_colors, name_col, cluster_col):
+    for name, cluster_id, lat, lon in points[[name_col, cluster_col, 'lat', 'lon']].itertuples(index=False):
+        color = cluster_colors[cluster_id]
+        folium.CircleMarker(
+            location=[lat, lon],
+            radius=5,
+            color=color,
+            fill=True,
+            fill_color=color,
+            fill_opacity=0.7,
+            popup=folium.Popup(f"{name} (Cluster {cluster_id})", max_width=300)
+        ).add_to(m)
+
+
+# クラスタごとに1つのGeoJSONレイヤーとして追加する（大量のノード向け）
+def _add_geojson_layers(m, points, cluster_colors, name_col, cluster_col):
+    for cluster_id, cluster_points in points.groupby(cluster_col, sort=True):
+        color = cluster_colors[cluster_id]
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+                "properties": {name_col: str(name), cluster_col: str(cluster_id)},
+            }
+            for name, lat, lon in cluster_points[[name_col, 'lat', 'lon']].itertuples(index=False)
+        ]
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            name=f"Cluster {cluster_id}",
+            marker=folium.CircleMarker(radius=5, color=color, fill=True, fill_color=color, fill_opacity=0.7),
+            popup=folium.GeoJsonPopup(fields=[name_col, cluster_col]),
+        ).add_to(m)
+    folium.LayerControl().add_to(m)
+
+
+# マーカーをクラスタ化して描画する（数万点でも軽い）
+def _add_fast_clusters(m, points, cluster_colors, name_col, cluster_col):
+    data = [
+        [float(lat), float(lon), cluster_colors[cluster_id], f"{name} (Cluster {cluster_id})"]
+        for name, cluster_id, lat, lon in points[[name_col, cluster_col, 'lat', 'lon']].itertuples(index=False)
+    ]
+    FastMarkerCluster(data, callback=_FAST_MARKER_CALLBACK).add_to(m)
+
+
+# 地図を作成してHTMLに保存する関数
+# mode: "markers"（1点ずつ）, "geojson"（クラスタごとのGeoJSONレイヤー）,
+#       "cluster"（マーカークラスタ）, "auto"（ノード数で markers / geojson を切り替え）
+@instrumented("write_cluster_map")
+def write_cluster_map(points, map_file, cluster_colors, mode='auto', name_col='企業名', cluster_col='クラスタID',
+                      location=(35.6895, 139.6917), zoom_start=11):
+    if mode == 'auto':
+        mode = 'markers' if len(points) <= HIGH_VOLUME_THRESHOLD else 'geojson'
+
+    m = folium.Map(location=list(location), zoom_start=zoom_start)  # 東京を中心に地図を初期化
+    if mode == 'markers':
+        _add_markers(m, points, cluster_colors, name_col, cluster_col)
+    elif mode == 'geojson':
+        _add_geojson_layers(m, points, cluster_colors, name_col, cluster_col)
+    elif mode == 'cluster':
+        _add_fast_clusters(m, points, cluster_colors, name_col, cluster_col)
+    else:
+        raise ValueError(f"Unknown map mode: {mode}")
+    m.save(map_file)
+    return m
@@ -0,0 +1,206 @@
+import argparse
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from coinvestment import build_incidence
+from data_loader import read_excel_cached
+from pipeline import INVESTMENT_PATH
+from projection import COMPANY_COL, investor_company_matrix
+
+# 2^61 - 1（メルセンヌ素数）を法とするハッシュ関数族 h(x) = (a·x + b) mod P
+# a, b, x を32ビット未満にしておけば a·x + b は64ビットに収まる
+_PRIME = (1 << 61) - 1
+_MAX_HASH = 1 << 32
+
+
+# 閾値 threshold 付近で候補になる確率が急に上がるように、バンド数×行数を num_perm から選ぶ関数
+# LSHで候補になる確率が 1/2 になる類似度はおよそ (1/bands)^(1/rows)
+def choose_bands(num_perm, threshold):
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+# 疎行列の各行（集合）のMinHash署名を計算する関数
+# ハッシュ関数をブロックごとに全非ゼロ要素へまとめて適用し、行ごとの最小値を reduceat で取る
+# 空の行の署名は最大値で埋める
+def minhash_signatures(X, num_perm=128, seed=0, block=16):
+    X = sp.csr_matrix(X)
+    n = X.shape[0]
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((n, num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    nonempty = np.flatnonzero(np.diff(X.indptr))
+    if len(nonempty) == 0:
+        return signatures
+    items = X.indices.astype(np.uint64)
+    starts = X.indptr[nonempty]
+    for first in range(0, num_perm, block):
+        last = min(first + block, num_perm)
+        hashed = (a[None, first:last] * items[:, None] + b[None, first:last]) % np.uint64(_PRIME)
+        hashed = (hashed % np.uint64(_MAX_HASH)).astype(np.uint32)
+        signatures[nonempty, first:last] = np.minimum.reduceat(hashed, starts, axis=0)
+    return signatures
+
+
+# MinHash署名とLSHのバケットで、集合が似ている出資元を探す索引
+class MinHashIndex:
+    def __init__(self, X, labels, num_perm=128, threshold=0.5, seed=0, max_bucket_size=1000):
+        self.X = sp.csr_matrix(X, dtype=np.float64, copy=True)
+        self.X.data[:] = 1
+        self.labels = pd.Index(labels)
+        self.positions = {label: i for i, label in enumerate(self.labels)}
+        self.sizes = np.diff(self.X.indptr)
+        self.max_bucket_size = max_bucket_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self.signatures = minhash_signatures(self.X, num_perm, seed)
+
+        # バンドごとに、行→バケット番号 と バケット番号順に並べた行
+        self.buckets = []
+        for band in range(self.bands):
+            keys = np.ascontiguousarray(self.signatures[:, band * self.rows:(band + 1) * self.rows])
+            keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * self.rows))).ravel()
+            _, bucket = np.unique(keys, return_inverse=True)
+            bucket = bucket.ravel()
+            # 空集合の行はどのバケットにも入れない
+            bucket[self.sizes == 0] = -1
+            order = np.argsort(bucket, kind="stable")
+            bounds = np.searchsorted(bucket[order], np.arange(bucket.max() + 2))
+            self.buckets.append((bucket, order, bounds))
+
+    # 共同出資先の集合で作る（G は共同出資グラフ）
+    @classmethod
+    def from_graph(cls, G, **kwargs):
+        nodes = list(G.nodes())
+        A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=None, format="csr")
+        A.setdiag(0)
+        A.eliminate_zeros()
+        return cls(A, nodes, **kwargs)
+
+    # 出資元データから作る
+    # by="coinvestors" なら共同出資先の集合、"portfolio" なら出資先企業の集合
+    @classmethod
+    def from_investments(cls, df, by="coinvestors", **kwargs):
+        if by == "coinvestors":
+            B, _, investors = build_incidence(df)
+            A = (B.T @ B).tocsr()
+            A.setdiag(0)
+            A.eliminate_zeros()
+            return cls(A, investors, **kwargs)
+        if by == "portfolio":
+            M, investors, _ = investor_company_matrix(df, by=COMPANY_COL)
+            return cls(M, investors, **kwargs)
+        raise ValueError(f"Unknown set type: {by}")
+
+    # 署名の一致割合（ジャカード係数の推定値）
+    def estimate(self, u, v):
+        return (self.signatures[u] == self.signatures[v]).mean(axis=-1)
+
+    # 正確なジャカード係数（疎行列の行どうしの積で共通部分を数える）
+    def exact(self, u, v):
+        u, v = np.atleast_1d(u), np.atleast_1d(v)
+        intersection = np.asarray(self.X[u].multiply(self.X[v]).sum(axis=1)).ravel()
+        union = self.sizes[u] + self.sizes[v] - intersection
+        return np.divide(intersection, union, out=np.zeros(len(u)), where=union > 0)
+
+    # 同じバケットに入ったことのある行（自分自身を除く）
+    def candidates(self, position):
+        found = []
+        for bucket, order, bounds in self.buckets:
+            b = bucket[position]
+            if b < 0:
+                continue
+            members = order[bounds[b]:bounds[b + 1]]
+            if len(members) <= self.max_bucket_size:
+                found.append(members)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        found = np.unique(np.concatenate(found))
+        return found[found != position]
+
+    # name と似ている上位 k 件を (名前, 類似度) のリストで返す
+    # rerank=True なら候補を正確なジャカード係数で並べ直す
+    # LSHの候補が k 件に満たない場合（類似度の低い出資元）は、全出資元との正確なジャカード係数で選ぶ
+    def top_k(self, name, k=20, rerank=True):
+        position = self.positions[name]
+        candidates = self.candidates(position)
+        if len(candidates) < k:
+            candidates, scores = self.exact_all(position)
+        else:
+            query = np.full(len(candidates), position)
+            scores = self.exact(query, candidates) if rerank else self.estimate(position, candidates)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(self.labels[i], float(s)) for i, s in zip(candidates[top], scores[top])]
+
+    # 1つの行と共通部分のある全行との正確なジャカード係数（疎行列の積 X[pos]·Xᵀ を1回だけ計算する）
+    def exact_all(self, position):
+        intersection = (self.X[position] @ self.X.T).tocoo()
+        others = intersection.col
+        keep = others != position
+        others, intersection = others[keep], intersection.data[keep]
+        union = self.sizes[position] + self.sizes[others] - intersection
+        return others, intersection / union
+
+    # 類似度が threshold 以上のペアを (u, v, 類似度) のDataFrameで返す
+    # 候補は同じバケットに入ったペアだけなので、計算量はバケットの大きさの合計に比例する
+    def all_pairs(self, threshold=None, rerank=True, chunk_size=1 << 20):
+        threshold = (1 / self.bands) ** (1 / self.rows) if threshold is None else threshold
+        n = self.X.shape[0]
+        keys = []
+        for bucket, order, bounds in self.buckets:
+            counts = np.diff(bounds)
+            for b in np.flatnonzero((counts >= 2) & (counts <= self.max_bucket_size)):
+                members = np.sort(order[bounds[b]:bounds[b + 1]])
+                u, v = np.triu_indices(len(members), k=1)
+                keys.append(members[u].astype(np.int64) * n + members[v])
+        if not keys:
+            return pd.DataFrame({"source": [], "target": [], "similarity": []})
+        keys = np.unique(np.concatenate(keys))
+
+        sources, targets, scores = [], [], []
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            u, v = chunk // n, chunk % n
+            score = self.exact(u, v) if rerank else self.estimate(u, v)
+            keep = score >= threshold
+            sources.append(u[keep])
+            targets.append(v[keep])
+            scores.append(score[keep])
+        u, v = np.concatenate(sources), np.concatenate(targets)
+        return pd.DataFrame({"source": self.labels[u], "target": self.labels[v], "similarity": np.concatenate(scores)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MinHash/LSHで似ている出資元を探す")
+    parser.add_argument("--file", default=INVESTMENT_PATH)
+    parser.add_argument("--by", choices=["coinvestors", "portfolio"], default="coinvestors")
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--name", help="この出資元に似ている上位k件を表示する")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--estimate", action="store_true", help="候補を正確なジャカード係数で並べ直さない")
+    parser.add_argument("--output", default="similar_investor_pairs.csv")
+    args = parser.parse_args()
+
+    index = MinHashIndex.from_investments(
+        read_excel_cached(args.file), by=args.by, num_perm=args.num_perm, threshold=args.threshold,
+    )
+    if args.name:
+        for other, similarity in index.top_k(args.name, args.k, rerank=not args.estimate):
+            print(f"{similarity:.3f}  {other}")
+    else:
+        pairs = index.all_pairs(args.threshold, rerank=not args.estimate)
+        print(f"{len(pairs)} pairs with similarity >= {args.threshold}")
+        pairs.to_csv(args.output, index=False)
+        print(f"Pairs saved as {args.output}")
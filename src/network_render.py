@@ -0,0 +1,237 @@
+import colorsys
+import html
+import json
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+
+from report import load_font
+from instrumentation import instrumented
+
+INTER_CLUSTER_COLOR = "#808080"
+
+
+# クラスタごとの色を返す関数（色相を黄金比でずらすので、隣り合うIDでも色が離れる）
+def cluster_palette(clusters, saturation=0.65, value=0.85):
+    palette = {}
+    for i, cluster in enumerate(sorted(clusters)):
+        r, g, b = colorsys.hsv_to_rgb((i * 0.618033988749895) % 1.0, saturation, value)
+        palette[cluster] = f"#{int(r * 255):02X}{int(g * 255):02X}{int(b * 255):02X}"
+    return palette
+
+
+# 描画に使う配列を作る関数
+# 戻り値は (ノードのリスト, 座標 (n, 2), ノードごとのクラスタ, エッジの端点番号 (m, 2))
+def network_arrays(G, pos, partition):
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    xy = np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+    clusters = np.array([partition.get(node, -1) for node in nodes])
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+    return nodes, xy, clusters, edges
+
+
+# ネットワークを1つの Axes に描画する関数
+# ノードは1回の scatter、エッジは1つの LineCollection でまとめて描画する
+# クラスタ内のエッジはクラスタの色、クラスタ間のエッジは灰色にする
+@instrumented("draw_network")
+def draw_network(ax, G, pos, partition, colors=None, node_size=300, labels=None, font_size=8):
+    nodes, xy, clusters, edges = network_arrays(G, pos, partition)
+    if colors is None:
+        colors = cluster_palette(set(clusters.tolist()))
+    node_rgba = np.array([to_rgba(colors.get(cluster, INTER_CLUSTER_COLOR), 0.8) for cluster in clusters.tolist()])
+    node_rgba = node_rgba.reshape(-1, 4)
+
+    if len(edges):
+        intra = clusters[edges[:, 0]] == clusters[edges[:, 1]]
+        edge_rgba = np.tile(to_rgba(INTER_CLUSTER_COLOR, 0.2), (len(edges), 1))
+        edge_rgba[intra] = node_rgba[edges[intra, 0]]
+        edge_rgba[intra, 3] = 0.5
+        ax.add_collection(LineCollection(xy[edges], colors=edge_rgba, linewidths=1.0, zorder=1))
+
+    ax.scatter(xy[:, 0], xy[:, 1], s=node_size, c=node_rgba, linewidths=0, zorder=2)
+    index = {node: i for i, node in enumerate(nodes)}
+    for node in labels or ():
+        x, y = xy[index[node]]
+        ax.text(x, y, str(node), fontsize=font_size, fontweight="bold", ha="center", va="center", zorder=3)
+    ax.autoscale_view()
+    ax.axis("off")
+    return ax
+
+
+# ネットワークを画像ファイルに描画する関数（pyplot を使わない）
+def render_network(G, pos, partition, filename, title=None, colors=None, labels=None,
+                   node_size=300, figsize=(15, 10), dpi=100):
+    load_font()
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    draw_network(ax, G, pos, partition, colors, node_size, labels)
+    if title:
+        ax.set_title(title)
+    fig.savefig(filename, bbox_inches="tight")
+    return filename
+
+
+# ブラウザだけで開ける対話的なHTMLを書き出す関数（サーバー不要）
+# 座標・色・エッジは1つのJSONとして埋め込み、canvas にエッジは色ごとに1本のパスでまとめて描画する
+# ドラッグで移動、ホイールで拡大縮小、ノードにマウスを重ねると名前とクラスタを表示する
+@instrumented("export_html")
+def export_html(G, pos, partition, filename, title="Investor Network", colors=None, labels=None):
+    nodes, xy, clusters, edges = network_arrays(G, pos, partition)
+    if colors is None:
+        colors = cluster_palette(set(clusters.tolist()))
+    palette = sorted(set(clusters.tolist()))
+    color_index = {cluster: i for i, cluster in enumerate(palette)}
+    index = {node: i for i, node in enumerate(nodes)}
+    data = {
+        "names": [str(node) for node in nodes],
+        "x": np.round(xy[:, 0], 5).tolist(),
+        "y": np.round(xy[:, 1], 5).tolist(),
+        "cluster": [color_index[cluster] for cluster in clusters.tolist()],
+        "clusterIds": [str(cluster) for cluster in palette],
+        "colors": [colors.get(cluster, INTER_CLUSTER_COLOR) for cluster in palette],
+        "edges": edges.ravel().tolist(),
+        "labels": [index[node] for node in labels or ()],
+    }
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(_HTML_TEMPLATE.replace("__TITLE__", html.escape(title)).replace("__DATA__", payload))
+    return filename
+
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  html, body { margin: 0; height: 100%; overflow: hidden; font-family: sans-serif; }
+  canvas { display: block; width: 100%; height: 100%; cursor: grab; }
+  #title { position: absolute; top: 8px; left: 12px; font-weight: bold; }
+  #tooltip { position: absolute; pointer-events: none; background: rgba(255,255,255,0.9);
+             border: 1px solid #999; padding: 2px 6px; font-size: 12px; display: none; }
+</style>
+</head>
+<body>
+<div id="title">__TITLE__</div>
+<div id="tooltip"></div>
+<canvas id="view"></canvas>
+<script>
+const data = __DATA__;
+const canvas = document.getElementById("view");
+const ctx = canvas.getContext("2d");
+const tooltip = document.getElementById("tooltip");
+const n = data.names.length;
+
+// データ座標の範囲から初期表示を決める
+let minX = Infinity, maxX = -Infinity, minY = Infinity, maxY = -Infinity;
+for (let i = 0; i < n; i++) {
+  minX = Math.min(minX, data.x[i]); maxX = Math.max(maxX, data.x[i]);
+  minY = Math.min(minY, data.y[i]); maxY = Math.max(maxY, data.y[i]);
+}
+let scale = 1, offsetX = 0, offsetY = 0;
+function fit() {
+  const w = canvas.clientWidth, h = canvas.clientHeight;
+  scale = 0.9 * Math.min(w / Math.max(maxX - minX, 1e-9), h / Math.max(maxY - minY, 1e-9));
+  offsetX = w / 2 - scale * (minX + maxX) / 2;
+  offsetY = h / 2 + scale * (minY + maxY) / 2;
+}
+const sx = i => offsetX + scale * data.x[i];
+const sy = i => offsetY - scale * data.y[i];
+
+// エッジを色ごとにまとめておく（クラスタ内は色付き、クラスタ間は灰色）
+const edgeGroups = data.colors.map(() => []);
+const interEdges = [];
+for (let e = 0; e < data.edges.length; e += 2) {
+  const u = data.edges[e], v = data.edges[e + 1];
+  if (data.cluster[u] === data.cluster[v]) edgeGroups[data.cluster[u]].push(u, v);
+  else interEdges.push(u, v);
+}
+const nodeGroups = data.colors.map(() => []);
+for (let i = 0; i < n; i++) nodeGroups[data.cluster[i]].push(i);
+
+function strokeEdges(list) {
+  ctx.beginPath();
+  for (let e = 0; e < list.length; e += 2) {
+    ctx.moveTo(sx(list[e]), sy(list[e]));
+    ctx.lineTo(sx(list[e + 1]), sy(list[e + 1]));
+  }
+  ctx.stroke();
+}
+
+let pending = false;
+function draw() {
+  pending = false;
+  const dpr = window.devicePixelRatio || 1;
+  canvas.width = canvas.clientWidth * dpr;
+  canvas.height = canvas.clientHeight * dpr;
+  ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+  ctx.clearRect(0, 0, canvas.clientWidth, canvas.clientHeight);
+  ctx.lineWidth = 0.5;
+  ctx.globalAlpha = 0.2;
+  ctx.strokeStyle = "#808080";
+  strokeEdges(interEdges);
+  ctx.globalAlpha = 0.5;
+  edgeGroups.forEach((list, c) => { ctx.strokeStyle = data.colors[c]; strokeEdges(list); });
+  ctx.globalAlpha = 0.8;
+  const r = Math.max(1.5, Math.min(6, scale / 200));
+  nodeGroups.forEach((list, c) => {
+    ctx.fillStyle = data.colors[c];
+    ctx.beginPath();
+    for (const i of list) { ctx.moveTo(sx(i) + r, sy(i)); ctx.arc(sx(i), sy(i), r, 0, 2 * Math.PI); }
+    ctx.fill();
+  });
+  ctx.globalAlpha = 1;
+  ctx.fillStyle = "#000";
+  ctx.font = "bold 11px sans-serif";
+  for (const i of data.labels) ctx.fillText(data.names[i], sx(i) + r + 2, sy(i) + 4);
+}
+function redraw() { if (!pending) { pending = true; requestAnimationFrame(draw); } }
+
+// マウス位置に最も近いノードを探す（画面上で8px以内）
+function nearest(mx, my) {
+  let best = -1, bestD = 64;
+  for (let i = 0; i < n; i++) {
+    const dx = sx(i) - mx, dy = sy(i) - my, d = dx * dx + dy * dy;
+    if (d < bestD) { bestD = d; best = i; }
+  }
+  return best;
+}
+
+let dragging = null;
+canvas.addEventListener("mousedown", e => { dragging = [e.clientX, e.clientY]; canvas.style.cursor = "grabbing"; });
+window.addEventListener("mouseup", () => { dragging = null; canvas.style.cursor = "grab"; });
+canvas.addEventListener("mousemove", e => {
+  if (dragging) {
+    offsetX += e.clientX - dragging[0]; offsetY += e.clientY - dragging[1];
+    dragging = [e.clientX, e.clientY];
+    tooltip.style.display = "none";
+    redraw();
+    return;
+  }
+  const i = nearest(e.clientX, e.clientY);
+  if (i < 0) { tooltip.style.display = "none"; return; }
+  tooltip.textContent = data.names[i] + " (クラスタ " + data.clusterIds[data.cluster[i]] + ")";
+  tooltip.style.left = (e.clientX + 12) + "px";
+  tooltip.style.top = (e.clientY + 12) + "px";
+  tooltip.style.display = "block";
+});
+canvas.addEventListener("wheel", e => {
+  e.preventDefault();
+  const factor = Math.exp(-e.deltaY * 0.001);
+  offsetX = e.clientX - (e.clientX - offsetX) * factor;
+  offsetY = e.clientY - (e.clientY - offsetY) * factor;
+  scale *= factor;
+  redraw();
+}, { passive: false });
+window.addEventListener("resize", () => { fit(); redraw(); });
+fit();
+redraw();
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,11 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+# プロセスプールを作成する関数
+# 分析スクリプトは if __name__ == "__main__" を使わずトップレベルで処理を書いているため、
+# spawn だとワーカー起動時にスクリプト全体が再実行されてしまう。使える環境では fork で起動する
+def process_pool(max_workers=None, **kwargs):
+    if "fork" in multiprocessing.get_all_start_methods():
+        kwargs.setdefault("mp_context", multiprocessing.get_context("fork"))
+    return ProcessPoolExecutor(max_workers=max_workers, **kwargs)
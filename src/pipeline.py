@@ -0,0 +1,133 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from collections import namedtuple
+
+import networkx as nx
+from community.community_louvain import best_partition
+
+from data_loader import file_hash, read_excel_cached
+from coinvestment import build_coinvestment_graph
+from consensus import cluster_stability, stable_partition
+from instrumentation import stage
+from jaccard import jaccard_edges
+
+INVESTMENT_PATH = "data/CREI_資金調達情報_出資元_2022_04_21.xlsx"
+
+# 各段階の計算結果の保存先
+CACHE_DIR = "data/.cache/pipeline"
+
+# stability は複数回のLouvain法を実行した場合のみ、クラスタごとの安定性の表（それ以外は None）
+PipelineResult = namedtuple("PipelineResult", ["graph", "partition", "modularity", "keys", "stability"],
+                            defaults=(None,))
+
+
+# 入力とパラメータからキャッシュキーを作る関数
+def stage_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# 段階の計算に使う関数を定義しているモジュールのソースのハッシュ値
+# キーに含めておくと、jaccard_edges などを書き換えたときに古い結果が使われない
+@functools.lru_cache(maxsize=None)
+def code_version(*functions):
+    digest = hashlib.sha1()
+    for module in sorted({inspect.getmodule(function) for function in functions}, key=lambda m: m.__name__):
+        digest.update(inspect.getsource(module).encode("utf-8"))
+    return digest.hexdigest()[:8]
+
+
+def stage_path(name, key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{name}-{key}.pkl")
+
+
+# 段階の結果をディスクにメモ化する関数（キーが同じなら再計算しない）
+# 計測が有効な場合はキャッシュの利用有無と結果の件数も記録する
+def memoize(name, key, compute, cache_dir=CACHE_DIR):
+    path = stage_path(name, key, cache_dir)
+    with stage(name, key=key) as current:
+        if os.path.exists(path):
+            current.count(cache_hit=True)
+            with open(path, "rb") as f:
+                return current.describe(pickle.load(f))
+        current.count(cache_hit=False)
+        result = current.describe(compute())
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return result
+
+
+# 共同出資グラフにジャカード係数のエッジを加えてKコアを取り出す関数
+def kcore_graph(G, jaccard, k):
+    G = G.copy()
+    G.add_weighted_edges_from(jaccard)
+    return nx.k_core(G, k)
+
+
+# パーティションからモジュラリティを計算する関数
+def partition_modularity(G, partition):
+    communities = {}
+    for node, cluster in partition.items():
+        communities.setdefault(cluster, set()).add(node)
+    return nx.algorithms.community.quality.modularity(G, communities.values())
+
+
+# 共同出資グラフを作成する段階（元ファイルのハッシュがキー）
+def coinvestment_stage(file_path=INVESTMENT_PATH, cache_dir=CACHE_DIR):
+    build_key = stage_key("coinvestment", code_version(build_coinvestment_graph), file_hash(file_path))
+    G = memoize(
+        "coinvestment", build_key,
+        lambda: build_coinvestment_graph(read_excel_cached(file_path)),
+        cache_dir,
+    )
+    return G, build_key
+
+
+# 共同出資グラフ → ジャカード係数 → Kコア → Louvain法 を実行する関数
+# 各段階のキーは前段のキーと自分のパラメータから作るので、
+# resolution だけ変えた場合は Louvain法のみ再実行される
+# runs > 1 の場合はシード random_state, random_state + 1, ... のLouvain法を並列に実行し、
+# method="best" ならモジュラリティ最大の実行、"consensus" ならコンセンサス・パーティションを使う
+def run_pipeline(file_path=INVESTMENT_PATH, threshold=0.3, k=3, resolution=1.0,
+                 random_state=None, runs=1, method="best", cache_dir=CACHE_DIR):
+    G, build_key = coinvestment_stage(file_path, cache_dir)
+    jaccard_key = stage_key(build_key, "jaccard", code_version(jaccard_edges), threshold)
+    kcore_key = stage_key(jaccard_key, "kcore", code_version(kcore_graph), k)
+    louvain_version = code_version(_louvain, stable_partition)
+
+    jaccard = memoize("jaccard", jaccard_key, lambda: jaccard_edges(G, threshold), cache_dir)
+    core = memoize("kcore", kcore_key, lambda: kcore_graph(G, jaccard, k), cache_dir)
+    if runs > 1:
+        louvain_key = stage_key(kcore_key, "louvain", louvain_version, resolution, random_state, runs, method)
+        partition, modularity, stability = memoize(
+            "louvain", louvain_key,
+            lambda: _multi_louvain(core, resolution, random_state or 0, runs, method),
+            cache_dir,
+        )
+    else:
+        louvain_key = stage_key(kcore_key, "louvain", louvain_version, resolution, random_state)
+        partition, modularity = memoize(
+            "louvain", louvain_key,
+            lambda: _louvain(core, resolution, random_state),
+            cache_dir,
+        )
+        stability = None
+    keys = {"coinvestment": build_key, "jaccard": jaccard_key, "kcore": kcore_key, "louvain": louvain_key}
+    return PipelineResult(core, partition, modularity, keys, stability)
+
+
+def _louvain(G, resolution, random_state):
+    partition = best_partition(G, weight="weight", resolution=resolution, random_state=random_state)
+    return partition, partition_modularity(G, partition)
+
+
+def _multi_louvain(G, resolution, random_state, runs, method):
+    partition, partitions = stable_partition(G, runs, resolution, random_state, method)
+    return partition, partition_modularity(G, partition), cluster_stability(partition, partitions)
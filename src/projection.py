@@ -0,0 +1,114 @@
+import argparse
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from coinvestment import INVESTOR_COL, ROUND_COL
+from data_loader import read_excel_cached
+from pipeline import INVESTMENT_PATH
+
+COMPANY_COL = "企業ID"
+WEIGHTINGS = ("count", "newman", "overlap")
+
+
+# 出資元×出資先企業の疎な接続行列を作成する関数
+# by=ROUND_COL（資金調達ID）を渡すと、列を企業ではなく資金調達ラウンドにする
+# 戻り値は (行列, 出資元の配列, 企業（またはラウンド）の配列)
+def investor_company_matrix(df, investor_col=INVESTOR_COL, by=COMPANY_COL):
+    df = df.dropna(subset=[investor_col, by])
+    investor_codes, investors = pd.factorize(df[investor_col])
+    company_codes, companies = pd.factorize(df[by])
+    M = sp.csr_matrix(
+        (np.ones(len(df), dtype=np.float64), (investor_codes, company_codes)),
+        shape=(len(investors), len(companies)),
+    )
+    M.data[:] = 1
+    return M, investors, companies
+
+
+# 接続行列 X（射影する側×もう一方）から X·W·Xᵀ の上三角を行のチャンクごとに計算する関数
+# weighting:
+#   "count"   … 共通の相手の数
+#   "newman"  … 共通の相手 j ごとに 1/(n_j − 1)（n_j は j に接続する数。混み合った企業・ラウンドほど軽くなる）
+#   "overlap" … 共通の相手の数 / min(次数_u, 次数_v)
+# 戻り値は (行番号, 列番号, 重み) の配列（行番号 < 列番号）
+def project(X, weighting="count", chunk_size=2048):
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting: {weighting}")
+    X = sp.csr_matrix(X, dtype=np.float64)
+    X.data[:] = 1
+    n = X.shape[0]
+    degree = np.asarray(X.sum(axis=1)).ravel()
+    XT = X.T.tocsr()
+    if weighting == "newman":
+        # 接続数が1の相手は射影にエッジを作らないので重みは0でよい
+        sizes = np.asarray(X.sum(axis=0)).ravel()
+        inverse = np.divide(1.0, sizes - 1, out=np.zeros_like(sizes), where=sizes > 1)
+        XT = sp.diags(inverse) @ XT
+
+    rows, cols, weights = [], [], []
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        product = (X[start:stop] @ XT).tocoo()
+        u = product.row + start
+        v = product.col
+        upper = v > u
+        u, v, w = u[upper], v[upper], product.data[upper]
+        if weighting == "overlap":
+            w = w / np.minimum(degree[u], degree[v])
+        keep = w > 0
+        rows.append(u[keep])
+        cols.append(v[keep])
+        weights.append(w[keep])
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+
+
+# 射影を (source, target, weight) のDataFrameで返す関数
+def projection_edges(X, labels, weighting="count", chunk_size=2048):
+    rows, cols, weights = project(X, weighting, chunk_size)
+    return pd.DataFrame({"source": labels[rows], "target": labels[cols], "weight": weights})
+
+
+# 出資元–出資元の射影（共通の出資先企業でつなぐ）
+def investor_projection(df, weighting="count", by=COMPANY_COL, investor_col=INVESTOR_COL, chunk_size=2048):
+    M, investors, _ = investor_company_matrix(df, investor_col, by)
+    return projection_edges(M, investors, weighting, chunk_size)
+
+
+# 企業–企業の射影（共通の出資元でつなぐ）
+def company_projection(df, weighting="count", investor_col=INVESTOR_COL, company_col=COMPANY_COL, chunk_size=2048):
+    M, _, companies = investor_company_matrix(df, investor_col, company_col)
+    return projection_edges(M.T.tocsr(), companies, weighting, chunk_size)
+
+
+# 射影のエッジからnetworkxのグラフを作成する関数
+def projection_graph(edges):
+    G = nx.Graph()
+    G.add_weighted_edges_from(edges.itertuples(index=False, name=None))
+    return G
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="出資元×企業の二部グラフの射影")
+    parser.add_argument("--file", default=INVESTMENT_PATH)
+    parser.add_argument("--side", choices=["investor", "company"], default="investor")
+    parser.add_argument("--weighting", choices=WEIGHTINGS, default="count")
+    parser.add_argument("--by-round", action="store_true", help="出資元の射影で企業の代わりに資金調達IDでつなぐ")
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    parser.add_argument("--output", default="projection_edges.csv")
+    args = parser.parse_args()
+
+    df = read_excel_cached(args.file)
+    if args.side == "investor":
+        by = ROUND_COL if args.by_round else COMPANY_COL
+        edges = investor_projection(df, args.weighting, by=by, chunk_size=args.chunk_size)
+    else:
+        edges = company_projection(df, args.weighting, chunk_size=args.chunk_size)
+    print(f"{args.side} projection ({args.weighting}): {len(edges)} edges")
+    edges.to_csv(args.output, index=False)
+    print(f"Projection saved as {args.output}")
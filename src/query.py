@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from address import add_location_columns
+from coinvestment import INVESTOR_COL
+from data_loader import read_excel_cached
+from entity_index import normalize_name, normalize_names
+from graph_store import NODE_ID_COL, CompactGraph
+from pipeline import INVESTMENT_PATH
+
+# visualization.py が保存する、ジャカード係数のエッジを含まない共同出資グラフ（クラスタIDはKコアのパーティション）
+GRAPH_PATH = "coinvestment_graph"
+# 企業一覧はポートフォリオの上場区分・地域・企業名にだけ使う（なければ件数だけ集計する）
+COMPANY_INFO_PATH = None
+CLUSTER_COL = "クラスタID"
+COMPANY_ID_COL = "企業ID"
+
+
+# 保存済みのネットワークと企業データを一度だけ読み込み、索引を作っておく問い合わせ層
+# 各問い合わせは辞書と配列を引くだけなので、読み込み後はExcelやグラフの再計算を行わない
+class NetworkQuery:
+    def __init__(self, graph, investment_info, company_info, top_companies=20):
+        self.graph = graph
+        nodes = graph.nodes
+        self.names = nodes[INVESTOR_COL].astype(str).to_numpy()
+        # Kコアに含まれない出資元のクラスタIDは None
+        self.clusters = nodes[CLUSTER_COL].astype("Int64").to_numpy(dtype=object, na_value=None)
+        self.node_ids = {name: i for i, name in enumerate(self.names)}
+        self.normalized_ids = {}
+        for i, name in enumerate(self.names):
+            self.normalized_ids.setdefault(normalize_name(name), i)
+        self.indptr = np.asarray(graph.indptr)
+        self.indices = np.asarray(graph.indices)
+        self.weights = np.asarray(graph.weights)
+        self.portfolios = self._build_portfolios(investment_info, company_info, top_companies)
+
+    @classmethod
+    def load(cls, graph_path=GRAPH_PATH, investment_path=INVESTMENT_PATH, company_path=COMPANY_INFO_PATH,
+             top_companies=20):
+        graph = CompactGraph.load(graph_path, mmap=False)
+        company_info = None
+        if company_path and os.path.exists(company_path):
+            company_info = read_excel_cached(company_path)
+        elif company_path:
+            print(f"Company list {company_path} not found; portfolios will not include company details",
+                  file=sys.stderr)
+        return cls(graph, read_excel_cached(investment_path), company_info, top_companies)
+
+    # 企業名の列をノードIDの列に変換する（node_id と同じく、完全一致がなければ正規化した名前で照合する）
+    def node_ids_of(self, names):
+        names = names.astype(str)
+        ids = names.map(self.node_ids)
+        missing = ids.isna()
+        if missing.any():
+            ids[missing] = normalize_names(names[missing]).map(self.normalized_ids)
+        return ids
+
+    # クラスタごとのポートフォリオ（出資先企業の件数・上場区分・地域・出資元の多い企業）を事前に集計する
+    def _build_portfolios(self, investment_info, company_info, top_companies):
+        rows = investment_info[[INVESTOR_COL, COMPANY_ID_COL]].dropna()
+        node = self.node_ids_of(rows[INVESTOR_COL])
+        rows = pd.DataFrame({
+            CLUSTER_COL: self.clusters[node.dropna().astype(int).to_numpy()],
+            NODE_ID_COL: node.dropna().astype(int).to_numpy(),
+            COMPANY_ID_COL: rows.loc[node.notna(), COMPANY_ID_COL].astype(str).to_numpy(),
+        }).drop_duplicates()
+
+        companies = None
+        if company_info is not None:
+            companies = add_location_columns(company_info.copy())
+            companies[COMPANY_ID_COL] = companies[COMPANY_ID_COL].astype(str)
+            companies = companies.drop_duplicates(COMPANY_ID_COL).set_index(COMPANY_ID_COL)
+
+        investors_per_cluster = pd.Series(self.clusters).value_counts()
+        portfolios = {}
+        for cluster, group in rows.groupby(CLUSTER_COL):
+            backers = group.groupby(COMPANY_ID_COL)[NODE_ID_COL].nunique().sort_values(ascending=False)
+            top = backers.head(top_companies)
+            portfolio = {
+                "cluster": _plain(cluster),
+                "investors": int(investors_per_cluster.get(cluster, 0)),
+                "companies": len(backers),
+                "top_companies": [
+                    {"企業ID": company_id, "investors": int(count)} for company_id, count in top.items()
+                ],
+            }
+            if companies is not None:
+                known = companies.reindex(backers.index)
+                for column in ("上場区分", "地域"):
+                    if column in known:
+                        counts = known[column].value_counts()
+                        portfolio[column] = {str(key): int(value) for key, value in counts[counts > 0].items()}
+                if "企業名" in known:
+                    for entry in portfolio["top_companies"]:
+                        name = known.at[entry["企業ID"], "企業名"]
+                        entry["企業名"] = None if pd.isna(name) else str(name)
+            portfolios[_plain(cluster)] = portfolio
+        return portfolios
+
+    # 企業名からノードIDを引く（完全一致がなければ正規化した名前で照合する）
+    def node_id(self, name):
+        node = self.node_ids.get(name)
+        if node is None:
+            node = self.normalized_ids.get(normalize_name(name))
+        if node is None:
+            raise KeyError(f"Unknown investor: {name}")
+        return node
+
+    # 出資元が属するクラスタ
+    def cluster_of(self, name):
+        node = self.node_id(name)
+        return {
+            "name": self.names[node],
+            "cluster": _plain(self.clusters[node]),
+            "degree": int(self.indptr[node + 1] - self.indptr[node]),
+        }
+
+    # 重み（共同出資回数）の大きい順に上位 k 社の共同出資先
+    def top_coinvestors(self, name, k=10):
+        if k < 1:
+            raise ValueError(f"k must be at least 1: {k}")
+        node = self.node_id(name)
+        start, stop = self.indptr[node], self.indptr[node + 1]
+        neighbors, weights = self.indices[start:stop], self.weights[start:stop]
+        if len(weights) > k:
+            top = np.argpartition(-weights, k)[:k]
+            neighbors, weights = neighbors[top], weights[top]
+        order = np.argsort(-weights, kind="stable")
+        return [
+            {"name": self.names[other], "weight": float(weight), "cluster": _plain(self.clusters[other])}
+            for other, weight in zip(neighbors[order], weights[order])
+        ]
+
+    # クラスタのポートフォリオの集計結果
+    def cluster_portfolio(self, cluster):
+        cluster = _plain(cluster)
+        if cluster not in self.portfolios:
+            # URLのクエリ文字列から来たIDは文字列なので数値としても探す
+            try:
+                cluster = int(cluster)
+            except (TypeError, ValueError):
+                pass
+        if cluster not in self.portfolios:
+            raise KeyError(f"Unknown cluster: {cluster}")
+        return self.portfolios[cluster]
+
+    # 1件の問い合わせ {"type": "cluster" | "coinvestors" | "portfolio", ...} に答える
+    def query(self, request):
+        if not isinstance(request, dict):
+            raise ValueError(f"Query must be an object: {request!r}")
+        kind = request.get("type")
+        if kind == "cluster":
+            return self.cluster_of(request["name"])
+        if kind == "coinvestors":
+            k = request.get("k", 10)
+            try:
+                k = int(k)
+            except (TypeError, ValueError):
+                raise ValueError(f"k must be a positive integer: {k!r}") from None
+            return self.top_coinvestors(request["name"], k)
+        if kind == "portfolio":
+            return self.cluster_portfolio(request["cluster"])
+        raise ValueError(f"Unknown query type: {kind}")
+
+    # 複数の問い合わせにまとめて答える（失敗した問い合わせは error を返し、他は続ける）
+    def batch(self, requests):
+        results = []
+        for request in requests:
+            try:
+                results.append({"result": self.query(request)})
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                results.append({"error": str(e.args[0]) if e.args else str(e)})
+        return results
+
+
+# NumPy の数値型を JSON にできるPythonの型に変換する
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# ローカル用のHTTPサーバー
+#   GET  /cluster?name=...            クラスタ
+#   GET  /coinvestors?name=...&k=10   上位の共同出資先
+#   GET  /portfolio?cluster=...       クラスタのポートフォリオ
+#   POST /batch                       問い合わせのJSON配列
+def make_handler(network):
+    routes = {"/cluster": "cluster", "/coinvestors": "coinvestors", "/portfolio": "portfolio"}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path not in routes:
+                return self._send(404, {"error": f"Unknown route: {url.path}"})
+            request = {key: values[0] for key, values in parse_qs(url.query).items()}
+            request["type"] = routes[url.path]
+            try:
+                return self._send(200, network.query(request))
+            except KeyError as e:
+                return self._send(404, {"error": str(e.args[0]) if e.args else str(e)})
+            except (ValueError, TypeError) as e:
+                return self._send(400, {"error": str(e)})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/batch":
+                return self._send(404, {"error": f"Unknown route: {self.path}"})
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                requests = json.loads(self.rfile.read(length) or b"[]")
+            except json.JSONDecodeError as e:
+                return self._send(400, {"error": str(e)})
+            if not isinstance(requests, list):
+                return self._send(400, {"error": "Request body must be a JSON array"})
+            return self._send(200, network.batch(requests))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(network, host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), make_handler(network))
+    print(f"Serving investor network queries on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="保存済みの投資家ネットワークへの問い合わせサーバー")
+    parser.add_argument("--graph", default=GRAPH_PATH)
+    parser.add_argument("--investments", default=INVESTMENT_PATH)
+    parser.add_argument("--companies", default=COMPANY_INFO_PATH,
+                        help="企業一覧のExcelファイル（省略時はポートフォリオに企業の詳細を含めない）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    serve(NetworkQuery.load(args.graph, args.investments, args.companies), args.host, args.port)
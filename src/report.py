@@ -0,0 +1,104 @@
+import math
+import os
+
+import matplotlib as mpl
+from matplotlib import font_manager
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from instrumentation import instrumented
+from parallel import process_pool
+
+# フォント設定
+FONT_PATH = "ipaexg.ttf"
+
+_font_loaded = False
+
+
+# 日本語フォントをプロセスごとに一度だけ読み込む関数
+# rcParams に設定するので、タイトルや目盛りごとに fontproperties を指定する必要はない
+def load_font(font_path=FONT_PATH):
+    global _font_loaded
+    if _font_loaded:
+        return
+    if os.path.exists(font_path):
+        font_manager.fontManager.addfont(font_path)
+        mpl.rcParams['font.family'] = font_manager.FontProperties(fname=font_path).get_name()
+    mpl.rcParams['axes.unicode_minus'] = False
+    _font_loaded = True
+
+
+# グラフの定義（辞書）を1つの Axes に描画する関数
+# kind: "bar"（x, y）, "hist"（values, bins）, "wordcloud"（frequencies）
+def draw_chart(ax, spec):
+    kind = spec['kind']
+    if kind == 'bar':
+        ax.bar(list(spec['x']), list(spec['y']), color=spec.get('color', 'skyblue'), alpha=spec.get('alpha', 0.8))
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+    elif kind == 'hist':
+        ax.hist(spec['values'], bins=spec.get('bins', 20), alpha=0.7, color=spec.get('color', 'blue'))
+        ax.grid(axis='y', alpha=0.75)
+    elif kind == 'wordcloud':
+        from wordcloud import WordCloud
+        wordcloud = WordCloud(
+            font_path=FONT_PATH if os.path.exists(FONT_PATH) else None,
+            background_color="white", width=800, height=400, regexp=r'\b\w+\b'
+        ).generate_from_frequencies(spec['frequencies'])
+        ax.imshow(wordcloud, interpolation='bilinear')
+        ax.axis("off")
+    else:
+        raise ValueError(f"Unknown chart kind: {kind}")
+
+    ax.set_title(spec.get('title', ''))
+    ax.set_xlabel(spec.get('xlabel', ''))
+    ax.set_ylabel(spec.get('ylabel', ''))
+    if spec.get('rotation'):
+        ax.tick_params(axis='x', labelrotation=spec['rotation'])
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment(spec.get('ha', 'center'))
+
+
+# グラフを1枚描画して保存する関数（pyplot を使わないので図が残らない）
+def render_chart(spec):
+    load_font()
+    fig = Figure(figsize=spec.get('figsize', (8, 6)))
+    FigureCanvasAgg(fig)
+    draw_chart(fig.add_subplot(), spec)
+    fig.savefig(spec['filename'], bbox_inches='tight')
+    return spec['filename']
+
+
+# 複数のグラフをワーカープロセスで並列に描画する関数
+def render_charts(specs, max_workers=None):
+    specs = list(specs)
+    if len(specs) <= 1:
+        return [render_chart(spec) for spec in specs]
+    with process_pool(max_workers=max_workers) as executor:
+        return list(executor.map(render_chart, specs))
+
+
+# 複数のグラフを1枚の画像にまとめて描画する関数（small multiples）
+def render_grid(specs, filename, ncols=4, title=None, panel_size=(4, 3)):
+    load_font()
+    specs = list(specs)
+    nrows = max(1, math.ceil(len(specs) / ncols))
+    fig = Figure(figsize=(panel_size[0] * ncols, panel_size[1] * nrows))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(nrows, ncols, squeeze=False).ravel()
+    for ax, spec in zip(axes, specs):
+        draw_chart(ax, spec)
+    for ax in axes[len(specs):]:
+        ax.axis("off")
+    if title:
+        fig.suptitle(title)
+    fig.tight_layout()
+    fig.savefig(filename, bbox_inches='tight')
+    return filename
+
+
+# 個別の画像として描画するか、1枚のグリッド画像にまとめるかを切り替える関数
+@instrumented("render_charts")
+def render(specs, grid_filename=None, ncols=4, title=None, max_workers=None):
+    if grid_filename:
+        return [render_grid(specs, grid_filename, ncols=ncols, title=title)]
+    return render_charts(specs, max_workers=max_workers)
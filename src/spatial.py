@@ -0,0 +1,180 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from entity_index import load_entity_index
+from instrumentation import instrumented
+from map_writer import join_geocode_by_id
+
+EARTH_RADIUS_KM = 6371.0088
+CLUSTER_COL = "クラスタID"
+CLUSTERED_NODES_PATH = "updated_kcore_clustered_nodes.csv"
+GEOCODE_PATH = "data/VC_address_geocode.csv"
+
+
+# 緯度経度（度）を単位球面上の3次元座標に変換する関数
+# 球面上の距離と3次元の直線距離（弦の長さ）は単調に対応するので、KD木で正確に近傍探索できる
+def unit_vectors(lat, lon):
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+# 単位ベクトル → 緯度経度（度）
+def to_latlon(vectors):
+    vectors = np.asarray(vectors, dtype=float)
+    lat = np.degrees(np.arctan2(vectors[..., 2], np.hypot(vectors[..., 0], vectors[..., 1])))
+    lon = np.degrees(np.arctan2(vectors[..., 1], vectors[..., 0]))
+    return lat, lon
+
+
+# 地表の距離（km）と弦の長さ（単位球）の変換
+def km_to_chord(km):
+    return 2 * np.sin(np.minimum(np.asarray(km, dtype=float) / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord, dtype=float) / 2, 0, 1))
+
+
+# haversine 距離（km）。配列はブロードキャストされる
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# 点の集合のすべての組の haversine 距離行列（km）
+def haversine_matrix(lat, lon):
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    return haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+# クラスタ → クラスタ内の距離行列（max_size を超えるクラスタは行列が大きくなるので除く）
+def cluster_distance_matrices(points, cluster_col=CLUSTER_COL, max_size=5000):
+    matrices = {}
+    for cluster, group in points.groupby(cluster_col):
+        if len(group) <= max_size:
+            matrices[cluster] = haversine_matrix(group["lat"].to_numpy(), group["lon"].to_numpy())
+    return matrices
+
+
+# 緯度経度を持つ点（出資元）の空間索引
+# 単位球面上の3次元座標でKD木を作り、半径（km）と近傍数の問い合わせに答える
+class SpatialIndex:
+    def __init__(self, points, lat_col="lat", lon_col="lon"):
+        self.points = points.dropna(subset=[lat_col, lon_col]).reset_index(drop=True)
+        self.lat = self.points[lat_col].to_numpy(dtype=float)
+        self.lon = self.points[lon_col].to_numpy(dtype=float)
+        self.vectors = unit_vectors(self.lat, self.lon)
+        self.tree = cKDTree(self.vectors)
+
+    def __len__(self):
+        return len(self.points)
+
+    # (lat, lon) から radius_km 以内の点を近い順に、距離（km）の列を付けて返す
+    def within(self, lat, lon, radius_km):
+        found = np.asarray(self.tree.query_ball_point(unit_vectors(lat, lon), km_to_chord(radius_km)), dtype=np.int64)
+        distance = haversine(lat, lon, self.lat[found], self.lon[found])
+        order = np.argsort(distance, kind="stable")
+        return self.points.iloc[found[order]].assign(distance_km=distance[order])
+
+    # (lat, lon) に近い k 点を、距離（km）の列を付けて返す
+    def nearest(self, lat, lon, k=10):
+        k = min(k, len(self))
+        if k == 0:
+            return self.points.iloc[:0].assign(distance_km=np.empty(0))
+        chord, found = self.tree.query(unit_vectors(lat, lon), k=k)
+        found = np.atleast_1d(found)
+        return self.points.iloc[found].assign(distance_km=chord_to_km(np.atleast_1d(chord)))
+
+    # 互いに radius_km 以内にある点の組（行番号 i < j の配列）
+    def pairs_within(self, radius_km):
+        pairs = self.tree.query_pairs(km_to_chord(radius_km), output_type="ndarray")
+        return pairs[:, 0], pairs[:, 1]
+
+
+# クラスタごとの地理的な統計量を、点の配列に対する一括の集計で計算する関数
+#   centroid_lat/lon  … 単位ベクトルの平均の方向（球面上の重心）
+#   mean/median/max_km_from_centroid, radius_of_gyration_km … 重心からの距離の統計（ばらつき）
+#   rms_pairwise_km   … 点の組の弦の長さの2乗平均平方根を地表の距離にしたもの（組ごとのループは行わない）
+#                       平均距離以上の値になる。正確な平均距離は cluster_distance_matrices から求める
+#   density_per_1000km2 … 重心を中心とする慣性半径の円の中にある点の数 / 円の面積（1000km² あたり）
+#   same_cluster_share … radius_km 以内の近傍のうち同じクラスタの割合
+#   expected_share    … 地理と無関係に所属が決まった場合の same_cluster_share の期待値
+# same_cluster_share が expected_share を大きく上回るクラスタは地理的にまとまっている
+@instrumented("cluster_geo_stats")
+def cluster_geo_stats(points, cluster_col=CLUSTER_COL, radius_km=5.0, index=None):
+    if index is None:
+        index = SpatialIndex(points)
+    codes, clusters = pd.factorize(index.points[cluster_col])
+    valid = codes >= 0
+    codes, vectors = codes[valid], index.vectors[valid]
+    lat, lon = index.lat[valid], index.lon[valid]
+    n_clusters = len(clusters)
+
+    sizes = np.bincount(codes, minlength=n_clusters)
+    mean_vector = np.zeros((n_clusters, 3))
+    np.add.at(mean_vector, codes, vectors)
+    mean_vector /= np.maximum(sizes, 1)[:, None]
+    centroid_lat, centroid_lon = to_latlon(mean_vector)
+
+    distance = haversine(lat, lon, centroid_lat[codes], centroid_lon[codes])
+    by_cluster = pd.Series(distance).groupby(codes)
+    radius_of_gyration = np.sqrt(np.bincount(codes, weights=distance ** 2, minlength=n_clusters) / np.maximum(sizes, 1))
+
+    # 単位ベクトルの組 i ≠ j の弦の2乗の平均は 2n/(n−1)·(1 − |平均ベクトル|²)
+    resultant = np.einsum("ij,ij->i", mean_vector, mean_vector)
+    mean_chord_sq = np.divide(2 * sizes * (1 - resultant), sizes - 1, out=np.zeros(n_clusters), where=sizes > 1)
+    rms_pairwise = chord_to_km(np.sqrt(np.maximum(mean_chord_sq, 0)))
+
+    # 各点と自分のクラスタの重心との距離は計算済みなので、慣性半径以内の点を配列で数える
+    inside = np.bincount(codes[distance <= radius_of_gyration[codes]], minlength=n_clusters)
+    area = np.pi * radius_of_gyration ** 2
+    density = np.divide(inside * 1000, area, out=np.full(n_clusters, np.nan), where=area > 0)
+
+    # radius_km 以内の点の組を一度に取り出し、同じクラスタかどうかを配列で判定する
+    i, j = index.pairs_within(radius_km)
+    original = np.flatnonzero(valid)
+    position = np.full(len(index), -1)
+    position[original] = np.arange(len(original))
+    i, j = position[i], position[j]
+    keep = (i >= 0) & (j >= 0)
+    ci, cj = codes[i[keep]], codes[j[keep]]
+    neighbors = np.bincount(ci, minlength=n_clusters) + np.bincount(cj, minlength=n_clusters)
+    same = np.bincount(ci[ci == cj], minlength=n_clusters) * 2
+    total = len(codes)
+    expected = (sizes - 1) / max(total - 1, 1)
+
+    return pd.DataFrame({
+        cluster_col: clusters,
+        "nodes": sizes,
+        "centroid_lat": centroid_lat,
+        "centroid_lon": centroid_lon,
+        "mean_km_from_centroid": by_cluster.mean().reindex(range(n_clusters)).to_numpy(),
+        "median_km_from_centroid": by_cluster.median().reindex(range(n_clusters)).to_numpy(),
+        "max_km_from_centroid": by_cluster.max().reindex(range(n_clusters)).to_numpy(),
+        "radius_of_gyration_km": radius_of_gyration,
+        "rms_pairwise_km": rms_pairwise,
+        "density_per_1000km2": density,
+        "neighbors_within_radius": neighbors,
+        "same_cluster_share": np.divide(same, neighbors, out=np.full(n_clusters, np.nan), where=neighbors > 0),
+        "expected_share": expected,
+    }).sort_values("nodes", ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="クラスタごとの地理的な統計量")
+    parser.add_argument("--nodes", default=CLUSTERED_NODES_PATH)
+    parser.add_argument("--geocode", default=GEOCODE_PATH)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--output", default="cluster_geo_stats.csv")
+    args = parser.parse_args()
+
+    points = join_geocode_by_id(pd.read_csv(args.nodes), pd.read_csv(args.geocode), load_entity_index())
+    stats = cluster_geo_stats(points, radius_km=args.radius_km)
+    print(stats.to_string(index=False))
+    stats.to_csv(args.output, index=False)
+    print(f"Cluster geographic statistics saved as {args.output}")
@@ -0,0 +1,105 @@
+import argparse
+import itertools
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from community.community_louvain import best_partition
+
+from graph_store import CompactGraph
+from jaccard import jaccard_edges
+from parallel import process_pool
+from pipeline import CACHE_DIR, INVESTMENT_PATH, coinvestment_stage, kcore_graph, partition_modularity
+
+# ワーカーごとに1回だけ読み込む共同出資グラフ
+_worker_graph = None
+
+
+# 共同出資グラフをCSR形式で保存し、そのパスを返す関数
+# ワーカーはこのファイルをメモリマップで開くので、タスクごとにグラフをpickleしない
+def shared_graph_path(file_path=INVESTMENT_PATH, cache_dir=CACHE_DIR):
+    G, build_key = coinvestment_stage(file_path, cache_dir)
+    path = os.path.join(cache_dir, f"coinvestment-{build_key}.csr")
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        CompactGraph.from_networkx(G).save(path)
+    return path
+
+
+def _init_worker(graph_path):
+    global _worker_graph
+    _worker_graph = CompactGraph.load(graph_path).to_networkx()
+
+
+# 同じ (threshold, k) のKコアはワーカー内で使い回す
+@lru_cache(maxsize=8)
+def _kcore(threshold, k):
+    return kcore_graph(_worker_graph, jaccard_edges(_worker_graph, threshold), k)
+
+
+# 1つのパラメータの組み合わせを評価する関数
+def _evaluate(params):
+    threshold, k, resolution, min_cluster_size, random_state = params
+    core = _kcore(threshold, k)
+    row = {
+        "threshold": threshold,
+        "k": k,
+        "resolution": resolution,
+        "kcore_nodes": core.number_of_nodes(),
+        "kcore_edges": core.number_of_edges(),
+    }
+    if core.number_of_nodes() == 0:
+        return row
+
+    partition = best_partition(core, weight="weight", resolution=resolution, random_state=random_state)
+    sizes = pd.Series(partition).value_counts().to_numpy()
+    kept = sizes[sizes >= min_cluster_size]
+    row.update({
+        "modularity": partition_modularity(core, partition),
+        "clusters": len(sizes),
+        "size_min": sizes.min(),
+        "size_median": np.median(sizes),
+        "size_max": sizes.max(),
+        "size_gini": _gini(sizes),
+        "kept_clusters": len(kept),
+        "kept_nodes": kept.sum(),
+    })
+    return row
+
+
+# クラスタサイズの偏り（ジニ係数）
+def _gini(sizes):
+    sizes = np.sort(sizes)
+    n = len(sizes)
+    return float((2 * np.arange(1, n + 1) - n - 1).dot(sizes) / (n * sizes.sum()))
+
+
+# threshold, k, resolution の全組み合わせをプロセスプールで評価する関数
+def sweep(thresholds, ks, resolutions, min_cluster_size=20, random_state=0,
+          file_path=INVESTMENT_PATH, max_workers=None):
+    graph_path = shared_graph_path(file_path)
+    # 同じ (threshold, k) のタスクが同じワーカーに渡りやすいように並べる
+    tasks = [
+        (threshold, k, resolution, min_cluster_size, random_state)
+        for threshold, k, resolution in itertools.product(thresholds, ks, resolutions)
+    ]
+    with process_pool(max_workers=max_workers, initializer=_init_worker, initargs=(graph_path,)) as executor:
+        rows = list(executor.map(_evaluate, tasks, chunksize=len(resolutions)))
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="threshold / k / resolution のパラメータ探索")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.3, 0.5, 0.7])
+    parser.add_argument("--ks", type=int, nargs="+", default=[3, 4, 6])
+    parser.add_argument("--resolutions", type=float, nargs="+", default=[0.8, 1.0, 1.5])
+    parser.add_argument("--min-cluster-size", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    results = sweep(args.thresholds, args.ks, args.resolutions,
+                    min_cluster_size=args.min_cluster_size, max_workers=args.workers)
+    print(results.to_string(index=False))
+    results.to_csv(args.output, index=False)
+    print(f"Sweep results saved as {args.output}")
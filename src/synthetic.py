@@ -0,0 +1,167 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from address import prefectures
+
+# 2022年4月版のCREIと同程度の件数（scale=1）
+# 資金調達情報_出資元 は約3.6万行・約2.2万ラウンド・出資先企業約5,700社・出資元約4,200社、
+# 決算情報は約1.4万行、サービス情報は約2.5万行
+BASE_COMPANIES = 5700
+BASE_INVESTORS = 5500
+BASE_SERVICE_TERMS = 3000
+
+LISTING_STATUSES = ["未上場", "東証グロース", "東証スタンダード", "東証プライム"]
+LISTING_WEIGHTS = [0.9, 0.06, 0.02, 0.02]
+
+# 所在地の偏り（東京都に集中し、残りは大都市圏とその他）
+_PREFECTURE_WEIGHTS = np.array([
+    {"東京都": 60, "神奈川県": 5, "大阪府": 6, "愛知県": 3, "福岡県": 3, "京都府": 2}.get(prefecture, 0.5)
+    for prefecture in prefectures
+])
+_PREFECTURE_WEIGHTS = _PREFECTURE_WEIGHTS / _PREFECTURE_WEIGHTS.sum()
+
+
+# 順位 i の出現確率が i^-exponent に比例する分布（出資元の活動量や単語の頻度）
+def zipf_weights(n, exponent=1.1):
+    weights = np.arange(1, n + 1, dtype=float) ** -exponent
+    return weights / weights.sum()
+
+
+# 1以上 upper 以下のべき分布に従う整数（ラウンドごとの出資元数や企業ごとのラウンド数）
+def power_law_counts(rng, size, exponent, upper):
+    return np.minimum(rng.zipf(exponent, size), upper)
+
+
+# 企業一覧（企業ID, 企業名, 住所, 上場区分, 従業員数, 合計資金調達額（百万円）, 評価額）
+def generate_companies(rng, n_companies):
+    company_ids = np.arange(1, n_companies + 1)
+    prefecture = rng.choice(prefectures, size=n_companies, p=_PREFECTURE_WEIGHTS)
+    block = rng.integers(1, 10, size=n_companies).astype(str)
+    return pd.DataFrame({
+        "企業ID": company_ids,
+        "企業名": [f"株式会社サンプル{i:07d}" for i in company_ids],
+        "住所": pd.Series(prefecture) + "サンプル市" + block + "-" + block + "-1",
+        "上場区分": rng.choice(LISTING_STATUSES, size=n_companies, p=LISTING_WEIGHTS),
+        "従業員数": np.round(rng.lognormal(3.0, 1.2, size=n_companies)).astype(int) + 1,
+        "評価額": np.round(rng.lognormal(7.0, 1.5, size=n_companies), 1),
+    })
+
+
+# 資金調達情報_出資元（資金調達ID, 資金調達日, 企業ID, 企業名, 出資元・企業ID, 出資元・企業名）
+# 企業ごとのラウンド数とラウンドごとの出資元数はべき分布、出資元は活動量のZipf分布から選ぶ
+# 既定の指数は2022年版の分布に合わせたもの（1社あたり平均約4ラウンド・1ラウンドあたり平均約1.6社、
+# どちらも1の割合がそれぞれ約4割・約8割）
+def generate_investments(rng, companies, n_investors, investor_exponent=1.0, round_exponent=2.6,
+                         company_exponent=1.95):
+    company_ids = companies["企業ID"].to_numpy()
+    rounds_per_company = power_law_counts(rng, len(company_ids), company_exponent, 65)
+    round_company = np.repeat(company_ids, rounds_per_company)
+    n_rounds = len(round_company)
+    round_ids = np.arange(1, n_rounds + 1)
+    round_dates = pd.Timestamp("2005-01-01") + pd.to_timedelta(rng.integers(0, 17 * 365, size=n_rounds), unit="D")
+
+    round_sizes = power_law_counts(rng, n_rounds, round_exponent, 25)
+    row_round = np.repeat(np.arange(n_rounds), round_sizes)
+    investor_ids = rng.choice(n_investors, size=len(row_round), p=zipf_weights(n_investors, investor_exponent)) + 1
+    investments = pd.DataFrame({
+        "資金調達ID": round_ids[row_round],
+        "資金調達日": round_dates[row_round],
+        "企業ID": round_company[row_round],
+        "出資元・企業ID": investor_ids + 10_000_000,
+        "出資元・企業名": [f"出資元{i:06d}" for i in investor_ids],
+    }).drop_duplicates(["資金調達ID", "出資元・企業ID"])
+
+    names = companies.set_index("企業ID")["企業名"]
+    investments.insert(3, "企業名", investments["企業ID"].map(names).to_numpy())
+    amounts = pd.Series(np.round(rng.lognormal(4.0, 1.3, size=n_rounds), 1), index=round_ids)
+    return investments.reset_index(drop=True), amounts, round_company
+
+
+# 決算情報（企業ID, 企業名, 決算日, 売上）企業ごとに1〜4期分
+def generate_financials(rng, companies):
+    company_ids = companies["企業ID"].to_numpy()
+    periods = rng.integers(1, 5, size=len(company_ids))
+    rows = np.repeat(company_ids, periods)
+    offset = np.concatenate([np.arange(count) for count in periods]) if len(periods) else np.empty(0, int)
+    return pd.DataFrame({
+        "企業ID": rows,
+        "企業名": np.repeat(companies["企業名"].to_numpy(), periods),
+        "決算日": pd.to_datetime([f"{2021 - year}-03-31" for year in offset]),
+        "売上": np.round(rng.lognormal(5.0, 2.0, size=len(rows)), 1),
+    })
+
+
+# サービス情報（企業ID, サービス名, サービス内容）
+# サービス内容は語彙からZipf分布で選んだ名詞を並べた文章
+def generate_services(rng, companies, n_terms):
+    company_ids = companies["企業ID"].to_numpy()
+    services_per_company = rng.integers(1, 8, size=len(company_ids))
+    rows = np.repeat(company_ids, services_per_company)
+    vocabulary = np.array([f"用語{i:05d}" for i in range(n_terms)])
+    lengths = rng.integers(5, 30, size=len(rows))
+    words = vocabulary[rng.choice(n_terms, size=lengths.sum(), p=zipf_weights(n_terms, 1.0))]
+    texts = ["、".join(chunk) + "を提供する。" for chunk in np.split(words, np.cumsum(lengths)[:-1])]
+    return pd.DataFrame({
+        "企業ID": rows,
+        "サービス名": [f"サービス{i:07d}" for i in range(len(rows))],
+        "サービス内容": texts,
+    })
+
+
+# CREIと同じ列構成の合成データを作成する関数
+# scale=1 で2022年版と同程度、scale=10, 100 で件数をその倍率に増やす
+def generate(scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    n_companies = int(BASE_COMPANIES * scale)
+    n_investors = int(BASE_INVESTORS * scale)
+    companies = generate_companies(rng, n_companies)
+    investments, amounts, round_company = generate_investments(rng, companies, n_investors)
+    totals = amounts.groupby(round_company).sum()
+    companies["合計資金調達額（百万円）"] = companies["企業ID"].map(totals).fillna(0).to_numpy()
+    return {
+        "資金調達情報_出資元": investments,
+        "企業一覧": companies,
+        "決算情報": generate_financials(rng, companies),
+        "サービス情報": generate_services(rng, companies, int(BASE_SERVICE_TERMS * max(1, np.sqrt(scale)))),
+    }
+
+
+# 合成データを保存する関数
+# Excelは1シート約104万行までなので、既定では data_loader のキャッシュと同じFeather形式で保存する
+def write_tables(tables, output_dir, fmt="feather"):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name, df in tables.items():
+        path = os.path.join(output_dir, f"CREI_{name}_synthetic.{'xlsx' if fmt == 'xlsx' else 'feather'}")
+        if fmt == "xlsx":
+            df.to_excel(path, index=False)
+        else:
+            df.to_feather(path)
+        paths[name] = path
+    return paths
+
+
+def load_tables(output_dir):
+    return {
+        name: pd.read_feather(os.path.join(output_dir, f"CREI_{name}_synthetic.feather"))
+        for name in ("資金調達情報_出資元", "企業一覧", "決算情報", "サービス情報")
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CREIと同じ列構成の合成データを作成する")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="data/synthetic")
+    parser.add_argument("--format", choices=["feather", "xlsx"], default="feather")
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        tables = generate(scale, args.seed)
+        output_dir = os.path.join(args.output_dir, f"x{scale:g}")
+        write_tables(tables, output_dir, args.format)
+        sizes = ", ".join(f"{name}: {len(df)} rows" for name, df in tables.items())
+        print(f"x{scale:g} -> {output_dir} ({sizes})")
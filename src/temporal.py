@@ -0,0 +1,136 @@
+import argparse
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from community.community_louvain import best_partition
+
+from coinvestment import ROUND_COL, INVESTOR_COL
+from data_loader import read_excel_cached
+from instrumentation import stage
+from jaccard import jaccard_pairs
+from pipeline import INVESTMENT_PATH, partition_modularity
+
+DATE_COL = "資金調達日"
+
+
+# 資金調達日の順に並べたラウンド×出資元の接続行列を作成する関数
+# 戻り値は (B, 各行のラウンドの調達日, 出資元の配列)。調達日のないラウンドは除く
+def dated_incidence(df, date_col=DATE_COL, round_col=ROUND_COL, investor_col=INVESTOR_COL):
+    df = df.dropna(subset=[round_col, investor_col]).copy()
+    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+    round_dates = df.groupby(round_col)[date_col].min().dropna().sort_values(kind="stable")
+    df = df[df[round_col].isin(round_dates.index)]
+
+    round_codes = pd.Index(round_dates.index).get_indexer(df[round_col])
+    investor_codes, investors = pd.factorize(df[investor_col])
+    B = sp.csr_matrix(
+        (np.ones(len(df), dtype=np.int32), (round_codes, investor_codes)),
+        shape=(len(round_dates), len(investors)),
+    )
+    B.data[:] = 1
+    return B, round_dates.to_numpy(), investors
+
+
+# ラウンドの集合（接続行列の行）の共同出資回数（上三角）
+def _pair_counts(B_rows):
+    return sp.triu(B_rows.T @ B_rows, k=1).tocsr()
+
+
+# 期間 [start, start + window_years) を step_years ごとにずらした時間窓の一覧
+def windows(dates, window_years=3, step_years=1):
+    if len(dates) == 0:
+        return []
+    first, last = pd.Timestamp(dates[0]), pd.Timestamp(dates[-1])
+    start = pd.Timestamp(year=first.year, month=1, day=1)
+    result = []
+    while start <= last:
+        result.append((start, start + pd.DateOffset(years=window_years)))
+        start += pd.DateOffset(years=step_years)
+    return result
+
+
+# 時間窓をずらしながら共同出資回数の行列を更新する関数
+# 窓に入ったラウンドの共同出資回数を足し、窓から出たラウンドの分を引くので、窓ごとに作り直さない
+# (start, end, 窓内のラウンド数, 共同出資回数の行列) を順に返す
+def sliding_coinvestment(B, dates, window_years=3, step_years=1):
+    n = B.shape[1]
+    C = sp.csr_matrix((n, n), dtype=np.int64)
+    lo, hi = 0, 0
+    for start, end in windows(dates, window_years, step_years):
+        new_lo = np.searchsorted(dates, np.datetime64(start), side="left")
+        new_hi = np.searchsorted(dates, np.datetime64(end), side="left")
+        entering = B[max(hi, new_lo):new_hi]
+        leaving = B[lo:min(new_lo, hi)]
+        if entering.shape[0]:
+            C = C + _pair_counts(entering)
+        if leaving.shape[0]:
+            C = C - _pair_counts(leaving)
+        C.eliminate_zeros()
+        lo, hi = new_lo, new_hi
+        yield start, end, new_hi - new_lo, C
+
+
+# 共同出資回数の行列（上三角）からジャカード係数のエッジを加えたKコアを作る関数
+def window_kcore(C, investors, threshold, k):
+    coo = C.tocoo()
+    G = nx.Graph()
+    G.add_weighted_edges_from(zip(investors[coo.row], investors[coo.col], coo.data.tolist()))
+    rows, cols, scores = jaccard_pairs(C + C.T, threshold)
+    G.add_weighted_edges_from(zip(investors[rows], investors[cols], scores.tolist()))
+    return G, nx.k_core(G, k)
+
+
+# 時間窓ごとのKコアとクラスタの統計情報を返す関数
+# 戻り値は (窓ごとの統計の DataFrame, 窓の開始日 → パーティション)
+def temporal_network_stats(df, window_years=3, step_years=1, threshold=0.3, k=3, resolution=1.0,
+                           random_state=0, date_col=DATE_COL):
+    B, dates, investors = dated_incidence(df, date_col)
+    rows = []
+    partitions = {}
+    for start, end, rounds, C in sliding_coinvestment(B, dates, window_years, step_years):
+        with stage("temporal_window", window=str(start.date())) as current:
+            G, core = window_kcore(C, investors, threshold, k)
+            row = {
+                "window_start": start.date(),
+                "window_end": end.date(),
+                "rounds": rounds,
+                "investors": G.number_of_nodes(),
+                "coinvestment_edges": C.nnz,
+                "kcore_nodes": core.number_of_nodes(),
+                "kcore_edges": core.number_of_edges(),
+            }
+            if core.number_of_nodes():
+                partition = best_partition(core, weight="weight", resolution=resolution, random_state=random_state)
+                sizes = pd.Series(partition).value_counts()
+                row.update({
+                    "clusters": len(sizes),
+                    "largest_cluster": sizes.max(),
+                    "modularity": partition_modularity(core, partition),
+                })
+                partitions[start] = partition
+            current.count(**{key: value for key, value in row.items() if isinstance(value, (int, np.integer))})
+        rows.append(row)
+    return pd.DataFrame(rows), partitions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="時間窓ごとの共同出資ネットワークの統計情報")
+    parser.add_argument("--file", default=INVESTMENT_PATH)
+    parser.add_argument("--window-years", type=int, default=3)
+    parser.add_argument("--step-years", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--resolution", type=float, default=1.0)
+    parser.add_argument("--date-col", default=DATE_COL)
+    parser.add_argument("--output", default="temporal_network_stats.csv")
+    args = parser.parse_args()
+
+    stats, _ = temporal_network_stats(
+        read_excel_cached(args.file), args.window_years, args.step_years,
+        args.threshold, args.k, args.resolution, date_col=args.date_col,
+    )
+    print(stats.to_string(index=False))
+    stats.to_csv(args.output, index=False)
+    print(f"Temporal statistics saved as {args.output}")
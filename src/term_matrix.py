@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfTransformer
+
+from instrumentation import instrumented
+from token_cache import company_texts, company_tokens, text_key
+
+CACHE_DIR = "data/.cache"
+
+# クラスタ×単語のTF-IDF行列と、行番号→クラスタID・列番号→単語の対応
+ClusterTfidf = namedtuple("ClusterTfidf", ["matrix", "terms", "cluster_ids"])
+
+
+# 企業ごとのトークンから 企業×単語 の出現回数行列を作成する関数
+def build_company_term_matrix(tokens_by_company):
+    company_ids = sorted(tokens_by_company)
+    vocabulary = {}
+    rows, cols = [], []
+    for row, company_id in enumerate(company_ids):
+        for token in tokens_by_company[company_id]:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+
+    # 列を単語の辞書順に並べ替える（TfidfVectorizer と同じ順序）
+    terms = np.array(sorted(vocabulary), dtype=object)
+    order = np.empty(len(vocabulary), dtype=np.int64)
+    order[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+
+    X = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (np.asarray(rows, dtype=np.int64), order[np.asarray(cols, dtype=np.int64)])),
+        shape=(len(company_ids), len(terms)),
+    )
+    X.sum_duplicates()
+    return X, pd.Index(company_ids), terms
+
+
+# 企業×単語行列をキャッシュから読み込む関数（サービス内容が変わった場合のみ作り直す）
+@instrumented("company_term_matrix")
+def load_company_term_matrix(services_df, id_col="企業ID", text_col="サービス内容", cache_dir=CACHE_DIR):
+    keys = company_texts(services_df, id_col, text_col).map(text_key)
+    digest = hashlib.sha1("\n".join(f"{company_id}\t{key}" for company_id, key in keys.items()).encode("utf-8"))
+    base = os.path.join(cache_dir, f"company_terms-{digest.hexdigest()[:16]}")
+
+    if os.path.exists(base + ".json"):
+        with open(base + ".json", encoding="utf-8") as f:
+            labels = json.load(f)
+        X = sp.load_npz(base + ".npz").tocsr()
+        return X, pd.Index(labels["companies"]), np.array(labels["terms"], dtype=object)
+
+    X, company_ids, terms = build_company_term_matrix(
+        company_tokens(services_df, id_col, text_col)
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    sp.save_npz(base + ".npz", X)
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump({"companies": company_ids.tolist(), "terms": terms.tolist()}, f, ensure_ascii=False)
+    return X, company_ids, terms
+
+
+# クラスタ→企業の対応表から クラスタ×企業 の所属行列を作成する関数
+def membership_matrix(bridge, company_ids, cluster_col="新クラスタID", id_col="企業ID"):
+    cluster_codes, cluster_ids = pd.factorize(bridge[cluster_col], sort=True)
+    company_rows = company_ids.get_indexer(bridge[id_col])
+    known = company_rows >= 0  # サービス情報のない企業は除外
+    M = sp.csr_matrix(
+        (np.ones(known.sum(), dtype=np.int32), (cluster_codes[known], company_rows[known])),
+        shape=(len(cluster_ids), len(company_ids)),
+    )
+    M.data[:] = 1
+    return M, list(cluster_ids)
+
+
+# クラスタごとの単語ベクトルを M·X で求め、TF-IDFに変換する関数
+# stop_words, max_df, min_df は TfidfVectorizer と同じ意味（文書＝クラスタ）
+def cluster_tfidf(X, terms, M, cluster_ids, stop_words=(), max_df=1.0, min_df=1, smooth_idf=True):
+    counts = (M @ X).tocsc()
+
+    keep = ~np.isin(terms, list(stop_words))
+    n_docs = counts.shape[0]
+    document_frequency = np.diff(counts.indptr)
+    max_count = max_df if isinstance(max_df, int) else max_df * n_docs
+    min_count = min_df if isinstance(min_df, int) else min_df * n_docs
+    keep &= (document_frequency <= max_count) & (document_frequency >= min_count)
+
+    counts = counts[:, np.flatnonzero(keep)].tocsr()
+    tfidf = TfidfTransformer(use_idf=True, smooth_idf=smooth_idf).fit_transform(counts)
+    return ClusterTfidf(tfidf.tocsr(), terms[keep], cluster_ids)
+
+
+# 1クラスタ分の {単語: TF-IDF値}（0より大きいもののみ）を返す関数
+def cluster_scores(result, cluster_id):
+    row_of_cluster = {cluster: row for row, cluster in enumerate(result.cluster_ids)}
+    row = result.matrix[row_of_cluster[cluster_id]]
+    return dict(zip(result.terms[row.indices], row.data))
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+from instrumentation import instrumented
+from parallel import process_pool
+
+# 企業ごとの名詞トークンの保存先（キーはテキストのハッシュ値）
+CACHE_PATH = "data/.cache/janome_nouns.pkl"
+
+# プロセスごとに1つだけ作成する形態素解析用のトークナイザー
+_tokenizer = None
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# テキストから名詞だけを取り出す関数
+# TfidfVectorizer の既定と同じく小文字化してから解析する
+def tokenize_nouns(text):
+    global _tokenizer
+    if _tokenizer is None:
+        from janome.tokenizer import Tokenizer
+        _tokenizer = Tokenizer()
+    return [token.surface for token in _tokenizer.tokenize(text.lower()) if token.part_of_speech.startswith("名詞")]
+
+
+def _tokenize_batch(texts):
+    return [tokenize_nouns(text) for text in texts]
+
+
+def load_token_cache(cache_path=CACHE_PATH):
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_token_cache(cache, cache_path=CACHE_PATH):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+# 企業ごとにサービス内容をまとめたテキストを作成する関数
+def company_texts(services_df, id_col="企業ID", text_col="サービス内容"):
+    texts = services_df[[id_col, text_col]].dropna()
+    texts = texts[texts[text_col].map(lambda text: isinstance(text, str))]  # 文字列以外を除外
+    return texts.groupby(id_col, sort=True)[text_col].agg(" ".join)
+
+
+# 企業ごとの名詞トークンを返す関数（戻り値は 企業ID -> トークンのリスト）
+# 解析済みのテキストはキャッシュから読み、未解析のテキストだけをプロセスプールで解析する
+@instrumented("company_tokens")
+def company_tokens(services_df, id_col="企業ID", text_col="サービス内容", cache_path=CACHE_PATH,
+                   max_workers=None, batch_size=200):
+    texts = company_texts(services_df, id_col, text_col)
+    keys = texts.map(text_key)
+
+    cache = load_token_cache(cache_path)
+    missing = pd.Series(texts.to_numpy(), index=keys.to_numpy())
+    missing = missing[~missing.index.isin(list(cache))]
+    missing = missing[~missing.index.duplicated()]
+
+    if len(missing):
+        batches = [missing.iloc[i:i + batch_size].tolist() for i in range(0, len(missing), batch_size)]
+        if len(batches) == 1:
+            results = [_tokenize_batch(batches[0])]
+        else:
+            with process_pool(max_workers=max_workers) as executor:
+                results = list(executor.map(_tokenize_batch, batches))
+        cache.update(zip(missing.index, (tokens for batch in results for tokens in batch)))
+        save_token_cache(cache, cache_path)
+
+    return {company_id: cache[key] for company_id, key in keys.items()}